@@ -0,0 +1,2 @@
+Export inline ``Choice`` vocabularies in a single pass over their terms,
+which makes serializing very large vocabularies considerably faster.
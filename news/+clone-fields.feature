@@ -0,0 +1,4 @@
+``syncSchema`` clones fields with the new ``utils.cloneField``, which shares
+the marker interface declaration of the field instead of declaring it again,
+and copies the field's tagged values so that setting one on the clone no
+longer changes the source field.
@@ -0,0 +1,5 @@
+Add ``plone.supermodel.codegen``: ``generate`` turns a model into the source
+of a Python module defining equivalent ``model.Schema`` subclasses, with
+fieldset directives and invariants, and ``compileFile`` (or the
+``supermodel-codegen`` script) writes and byte compiles the module for a
+model file. Importing the module replaces parsing the model at startup.
@@ -0,0 +1,4 @@
+Add an opt-in mode, enabled with the ``PLONE_SUPERMODEL_DEFERRED_FINALIZE``
+environment variable, in which schema plugins only run the first time a
+schema's fields or tagged values are used instead of when it is created or
+finalized.
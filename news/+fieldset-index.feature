@@ -0,0 +1,4 @@
+``Fieldset`` uses ``__slots__``. The new ``model.sortedFieldsets`` and
+``model.fieldsetIndex`` return the fieldsets of a schema sorted by order and
+a read-only mapping of field names to their fieldset. Both are remembered
+until the fieldsets tagged value is set again.
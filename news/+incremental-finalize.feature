@@ -0,0 +1,5 @@
+``finalizeSchemas`` walks the schema hierarchy iteratively and can run
+incrementally, finalizing only schemata whose applicable schema plugins
+changed or that had tagged values set since they were last finalized. Enable
+it with ``incremental=True`` or the ``PLONE_SUPERMODEL_INCREMENTAL_FINALIZE``
+environment variable; it logs how long it took.
@@ -0,0 +1,4 @@
+Set ``PLONE_SUPERMODEL_INTERN_STRINGS`` to share equal strings and i18n
+messages read from models through a bounded pool, sized by
+``PLONE_SUPERMODEL_INTERN_MAXSIZE``. ``utils.stringPool.stats()`` reports its
+size, hits and the memory it saved.
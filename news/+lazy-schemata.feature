@@ -0,0 +1,4 @@
+Add a ``lazy`` option to ``parser.parse`` and ``loadFile``: the model's
+``schemata`` is then a ``LazySchemata`` mapping that builds each schema on
+first access. ``xmlSchema`` and the ``load`` directive use it, so only the
+schemata that are actually used get built.
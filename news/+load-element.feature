@@ -0,0 +1,2 @@
+Add ``loadElement`` and ``parser.parse(element=...)`` to build a model from an
+already parsed lxml element without serializing and re-parsing it.
@@ -0,0 +1,4 @@
+Memory map model files instead of letting lxml read them, and keep a hash of
+the contents of each file in the ``loadFile`` cache. The new
+``reloadChangedModels`` parses cached files again only if their contents
+changed, hashing and parsing each file from a single mapping.
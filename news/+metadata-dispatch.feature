@@ -0,0 +1,4 @@
+Only call field and schema metadata handlers that have a ``namespace`` for
+the fields and schemata that use it. When serializing, metadata handlers can
+declare ``taggedValueKeys`` to be skipped for schemata that carry none of
+them.
@@ -0,0 +1,5 @@
+Add model bundles: ``python -m plone.supermodel.bundle`` (or the
+``supermodel-bundle`` script) packs the model files of packages into one
+uncompressed zip, optionally with their parsed form. Registered bundles,
+e.g. through the ``PLONE_SUPERMODEL_BUNDLES`` environment variable, are read
+with a single read and ``loadFile`` looks models up in them first.
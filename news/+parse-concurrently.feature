@@ -0,0 +1,7 @@
+Add ``parser.parseConcurrently`` to parse many models in a pool of threads.
+Loading the same file, building a lazily parsed schema and running deferred
+schema plugins from several threads now happens only once, and concurrent
+parses no longer race on field ordering or Choice value types. Loading model
+files, building lazily parsed schemata and deferred finalization are
+serialized by one process-wide lock; ``parse`` and ``parseConcurrently``
+still run in parallel.
@@ -0,0 +1,9 @@
+Keep the parse state (element stack and i18n domain) in a ``contextvars``
+based ``debug.ParseContext`` that is created for each parse, instead of a
+thread local. ``debug.parseinfo`` still gives access to the current context.
+Outside of a parse, and during a parse that does not track elements
+(``fast=True``), its ``stack`` is an empty stack that ignores pushes and whose
+current element is None, so no elements are kept alive; setting
+``parseinfo`` values outside of a parse has no effect.
+Add the ``parser.aparse`` and ``aloadFile`` coroutines that parse in an
+executor.
@@ -0,0 +1,4 @@
+``SupermodelParseError`` now keeps the original exception, the filename, the
+line and the tag of the failing element as ``orig_exc``, ``fname``,
+``lineno`` and ``tag``, and only renders its message (reading the source
+line and formatting the traceback) when it is converted to a string.
@@ -0,0 +1,6 @@
+Add ``parser.parseMany`` to parse many model files or strings in a pool of
+worker processes, returning the models (or the error for each source that
+failed) in the order of the sources.
+Workers are started with the platform's default start method and load the
+ZCML of plone.supermodel, and of the given ``packages``, unless they
+inherited the registrations or an ``initializer`` is given.
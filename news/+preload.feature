@@ -0,0 +1,4 @@
+Add ``preloadModels`` to read and parse many model files in a thread pool
+and put them in the ``loadFile`` cache. Setting the
+``PLONE_SUPERMODEL_PRELOAD_WORKERS`` environment variable preloads the model
+files of all schemata this way before they are finalized at startup.
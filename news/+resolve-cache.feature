@@ -0,0 +1,4 @@
+Remember resolved dotted names (``based-on``, invariants, default factories,
+interface and object field values) and the fields of base schemata while
+parsing, see ``utils.resolveDottedName`` and ``utils.getBaseFields``.
+Reloading or replacing a module invalidates the remembered objects.
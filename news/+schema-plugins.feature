@@ -0,0 +1,4 @@
+Cache the sorted ``ISchemaPlugin`` registrations until the component registry
+changes. Plugins can declare the tagged values they act on in
+``taggedValueKeys`` and are skipped for schemata without them; the plugins in
+this package do so.
@@ -0,0 +1,2 @@
+``parser.parse`` and ``loadString`` accept a ``schemata`` argument naming the
+schemata to build; all other ``<schema />`` elements in the model are skipped.
@@ -0,0 +1,3 @@
+Add ``serializeModelElement`` and ``serializer.serializeElement`` to get a
+model as an lxml element, optionally appended to a parent element, instead of
+a string.
@@ -0,0 +1,5 @@
+Set ``PLONE_SUPERMODEL_SHARE_FIELDS`` to share the attribute values of fields
+read from identical ``<field />`` elements through a bounded pool of template
+fields, sized by ``PLONE_SUPERMODEL_SHARE_FIELDS_MAXSIZE``.
+``parser.fieldPool.stats()`` reports the templates, hits and the memory
+saved.
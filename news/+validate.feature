@@ -0,0 +1,4 @@
+Add ``parser.validate`` to check a model without building it. It reads the
+fields and checks base schemata, invariants and fieldsets like ``parse``, but
+creates no schema, so schema plugins and metadata handlers do not run. All
+problems are returned as a list of ``SupermodelParseError``.
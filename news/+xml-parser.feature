@@ -0,0 +1,5 @@
+Reuse one lxml parser per thread instead of creating one for each model,
+see ``parser.xmlParser``. ``parse`` and ``loadString`` accept the model as
+bytes, ``bytearray`` or ``memoryview`` without wrapping it in a file object.
+Set ``PLONE_SUPERMODEL_HUGE_TREE`` (or pass ``huge_tree`` to
+``parser.parseTree``) to lift lxml's document size limits.
@@ -40,6 +40,7 @@ setup(
     install_requires=[
         "lxml",
         "zope.component",
+        "zope.configuration",
         "zope.i18nmessageid",
         "zope.interface",
         "zope.schema>=4.1.0",
@@ -57,5 +58,8 @@ setup(
     },
     entry_points="""
     # -*- Entry points: -*-
+    [console_scripts]
+    supermodel-bundle = plone.supermodel.bundle:main
+    supermodel-codegen = plone.supermodel.codegen:main
     """,
 )
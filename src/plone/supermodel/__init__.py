@@ -1,35 +1,232 @@
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from plone.supermodel import bundle
 from plone.supermodel import model
 from plone.supermodel import parser
 from plone.supermodel import serializer
 from plone.supermodel import utils
 from plone.supermodel.interfaces import FILENAME_KEY
 from plone.supermodel.interfaces import IXMLToSchema
+from plone.supermodel.interfaces import SCHEMA_NAME_KEY
 from zope.interface import moduleProvides
 
+import asyncio
+import contextlib
+import functools
+import logging
+import os
+import pickle
+import sys
+
+logger = logging.getLogger("plone.supermodel")
+
 # Cache models by absolute filename
 _model_cache = {}
 
+# Hashes of the contents of the cached model files, see reloadChangedModels()
+_model_hashes = {}
+
+# Loading model files is serialized process-wide: building schemata may
+# finalize their bases, and deferred finalization loads model files in turn,
+# so loading and finalization share model._finalize_lock. This also ensures
+# that each file is only parsed once when loaded concurrently.
+_model_lock = model._finalize_lock
+
 
 def xmlSchema(filename, schema="", policy="", _frame=2):
-    _model = loadFile(filename, policy=policy, _frame=_frame + 1)
+    _model = loadFile(filename, policy=policy, lazy=True, _frame=_frame + 1)
     return _model.schemata[schema]
 
 
-def loadFile(filename, reload=False, policy="", _frame=2):
+def loadFile(filename, reload=False, policy="", lazy=False, _frame=2):
     path = utils.relativeToCallingPackage(filename, _frame)
     if reload or path not in _model_cache:
-        parsed_model = parser.parse(path, policy=policy)
-        for schema in parsed_model.schemata.values():
-            schema.setTaggedValue(FILENAME_KEY, path)
-        _model_cache[path] = parsed_model
+        with _model_lock:
+            if reload or path not in _model_cache:
+                _cacheModel(path, *_parseFile(path, policy, lazy))
+    if not lazy:
+        # Build any schemata left pending by an earlier lazy load
+        list(_model_cache[path].schemata.values())
     return _model_cache[path]
 
 
-def loadString(model, policy=""):
-    if not isinstance(model, bytes):
+def aloadFile(filename, reload=False, policy="", lazy=False, executor=None, _frame=2):
+    """Return an awaitable for loadFile(), which parses the file in the given
+    concurrent.futures executor, by default the one of the event loop.
+
+    A relative filename is resolved right away, relative to the calling
+    package.
+    """
+    path = utils.relativeToCallingPackage(filename, _frame)
+    return _aloadFile(path, reload, policy, lazy, executor)
+
+
+async def _aloadFile(path, reload, policy, lazy, executor):
+    cached = None if reload else _model_cache.get(path)
+    if cached is not None:
+        schemata = cached.schemata
+        if (
+            lazy
+            or not isinstance(schemata, model.LazySchemata)
+            or not schemata.pending()
+        ):
+            return cached
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor,
+        functools.partial(loadFile, path, reload=reload, policy=policy, lazy=lazy),
+    )
+
+
+def _parseFile(path, policy="", lazy=False, unless=None):
+    """Parse the model file, from a registered bundle if one holds it, and
+    return the model and the hash of the file's contents. A file is hashed
+    and parsed from a single mapping. If the hash is unless, return None
+    instead.
+    """
+    bundled = bundle.lookup(path)
+    if bundled is None:
+        with contextlib.ExitStack() as stack:
+            try:
+                buffer = stack.enter_context(utils.mappedFile(path))
+            except OSError as e:
+                # A missing or unreadable file, reported like a broken one
+                raise parser.SupermodelParseError(e, path, None, sys.exc_info()[2])
+            return _parseBuffer(path, buffer, policy, lazy, unless)
+
+    xml, compiled = bundled
+    if compiled is None or policy:
+        return _parseBuffer(path, xml, policy, lazy, unless)
+    digest = utils.contentHash(xml)
+    if digest == unless:
+        return None
+    return parser._expandModel(pickle.loads(compiled)), digest
+
+
+def _parseBuffer(path, buffer, policy, lazy, unless):
+    digest = utils.contentHash(buffer)
+    if digest == unless:
+        return None
+    try:
+        tree = parser.parseTree(buffer, base_url=path)
+    except Exception as e:
+        raise parser.SupermodelParseError(e, path, None, sys.exc_info()[2])
+    return parser.parse(element=tree.getroot(), policy=policy, lazy=lazy), digest
+
+
+def reloadChangedModels(paths=None, policy=""):
+    """Parse the given cached model files again if their contents changed
+    since they were loaded. By default, all cached files are checked.
+    Return the paths of the files that were reloaded.
+    """
+    if paths is None:
+        paths = list(_model_cache)
+    reloaded = []
+    for path in paths:
+        with _model_lock:
+            cached = _model_cache.get(path)
+            if cached is None:
+                continue
+            lazy = isinstance(cached.schemata, model.LazySchemata)
+            parsed = _parseFile(path, policy, lazy, unless=_model_hashes.get(path))
+            if parsed is not None:
+                _cacheModel(path, *parsed)
+                reloaded.append(path)
+    return reloaded
+
+
+def _cacheModel(path, parsed_model, digest=None):
+    def tag(name, schema):
+        schema.setTaggedValue(FILENAME_KEY, path)
+        schema.setTaggedValue(SCHEMA_NAME_KEY, name)
+
+    _model_hashes[path] = digest
+    if isinstance(parsed_model.schemata, model.LazySchemata):
+        parsed_model.schemata.apply(tag)
+    else:
+        for name, schema in parsed_model.schemata.items():
+            tag(name, schema)
+    _model_cache[path] = parsed_model
+
+
+def preloadModels(sources=None, policy="", workers=None, _frame=2):
+    """Read and parse model files in a pool of threads and add them to the
+    loadFile() cache, with their schemata built lazily.
+
+    sources is an iterable of filenames and/or interfaces that name a model
+    file with the load directive. It defaults to all schemata extending
+    plone.supermodel.model.Schema. Files that are already cached are
+    skipped. Files that cannot be parsed are left for loadFile() to report.
+
+    Return the paths of the files that were added to the cache.
+    """
+    if sources is None:
+        sources = model._walk(model.Schema)
+
+    paths = []
+    for source in sources:
+        if isinstance(source, str):
+            path = utils.relativeToCallingPackage(source, _frame)
+        else:
+            path = utils.modelFilename(source)
+        if path is not None and path not in _model_cache and path not in paths:
+            paths.append(path)
+    if not paths:
+        return []
+
+    # Reading and parsing the XML happens in lxml without holding the GIL;
+    # building the models has to happen here.
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        trees = list(executor.map(_parseTree, paths))
+
+    loaded = []
+    for path, parsed in zip(paths, trees):
+        if parsed is None:
+            continue
+        tree, digest = parsed
+        with _model_lock:
+            if path in _model_cache:
+                continue
+            _cacheModel(
+                path,
+                parser.parse(element=tree.getroot(), policy=policy, lazy=True),
+                digest,
+            )
+        loaded.append(path)
+    return loaded
+
+
+def _parseTree(path):
+    try:
+        bundled = bundle.lookup(path)
+        if bundled is not None:
+            xml = bundled[0]
+            return parser.parseTree(xml, base_url=path), utils.contentHash(xml)
+        with utils.mappedFile(path) as buffer:
+            digest = utils.contentHash(buffer)
+            return parser.parseTree(buffer, base_url=path), digest
+    except Exception:
+        logger.debug("Could not preload model file %s", path, exc_info=True)
+        return None
+
+
+def preloadModelsAction():
+    """Configuration action preloading the model files of all schemata
+    before they are finalized, if the PLONE_SUPERMODEL_PRELOAD_WORKERS
+    environment variable is set to the number of threads to use.
+    """
+    workers = int(os.environ.get("PLONE_SUPERMODEL_PRELOAD_WORKERS") or 0)
+    if workers > 0:
+        preloadModels(workers=workers)
+
+
+def loadString(model, policy="", schemata=None):
+    if isinstance(model, str):
         model = model.encode()
-    return parser.parse(BytesIO(model), policy=policy)
+    return parser.parse(model, policy=policy, schemata=schemata)
+
+
+def loadElement(element, policy="", schemata=None):
+    return parser.parse(element=element, policy=policy, schemata=schemata)
 
 
 def serializeSchema(schema, name=""):
@@ -40,6 +237,21 @@ def serializeModel(model):
     return serializer.serialize(model)
 
 
+def serializeModelElement(model, parent=None):
+    return serializer.serializeElement(model, parent=parent)
+
+
 moduleProvides(IXMLToSchema)
 
-__all__ = ("xmlSchema", "loadFile", "loadString", "serializeSchema", "serializeModel")
+__all__ = (
+    "xmlSchema",
+    "loadFile",
+    "aloadFile",
+    "loadString",
+    "loadElement",
+    "preloadModels",
+    "reloadChangedModels",
+    "serializeSchema",
+    "serializeModel",
+    "serializeModelElement",
+)
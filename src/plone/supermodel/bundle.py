@@ -0,0 +1,196 @@
+"""Model bundles: many model files packed into a single file.
+
+A bundle is an uncompressed zip file. The XML of each model is stored under
+``models/<package>/<path>``, where path is relative to the directory of the
+package, e.g. ``models/plone.app.foo/models/page.xml``. A bundle built with
+``compile=True`` also holds a pickled, already parsed form of each model
+under ``compiled/<package>/<path>``, which loadFile() uses unless a policy
+is given.
+
+Registered bundles are read into memory with a single read, and loadFile()
+looks model files up in them before reading them from the filesystem. Set the
+PLONE_SUPERMODEL_BUNDLES environment variable to a list of bundle files,
+separated by os.pathsep, to register them on first use. The compiled models
+are unpickled, so only use bundles from trusted sources.
+
+Build a bundle with::
+
+    python -m plone.supermodel.bundle [--compile] [--zcml PACKAGE]
+        OUTPUT PACKAGE [PACKAGE ...]
+"""
+
+from io import BytesIO
+from plone.supermodel.interfaces import XML_NAMESPACE
+from plone.supermodel.parser import _compactModel
+from plone.supermodel.parser import parse
+from plone.supermodel.parser import parseTree
+from plone.supermodel.utils import configure
+
+import argparse
+import importlib.util
+import logging
+import os
+import pickle
+import sys
+import threading
+import zipfile
+
+logger = logging.getLogger("plone.supermodel")
+
+MODELS = "models/"
+COMPILED = "compiled/"
+
+# Bundled models by absolute filename: (bundle filename, key, xml, compiled)
+_entries = {}
+_lock = threading.Lock()
+_environment_loaded = False
+
+
+def registerBundle(filename):
+    """Read the bundle and make its models available to lookup(). Models of
+    packages that cannot be found are ignored. Return the number of models
+    registered.
+    """
+    with open(filename, "rb") as fd:
+        data = fd.read()
+
+    locations = {}
+    entries = {}
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        names = set(archive.namelist())
+        for name in names:
+            if not name.startswith(MODELS):
+                continue
+            key = name[len(MODELS) :]
+            package, _, relative = key.partition("/")
+            if package not in locations:
+                locations[package] = _packageDirectory(package)
+            directory = locations[package]
+            if directory is None:
+                continue
+            path = os.path.abspath(
+                os.path.join(directory, relative.replace("/", os.path.sep))
+            )
+            compiled = None
+            if COMPILED + key in names:
+                compiled = archive.read(COMPILED + key)
+            entries[path] = (filename, key, archive.read(name), compiled)
+
+    with _lock:
+        _entries.update(entries)
+    return len(entries)
+
+
+def clearBundles():
+    """Forget all registered bundles."""
+    global _environment_loaded
+    with _lock:
+        _entries.clear()
+        _environment_loaded = True
+
+
+def lookup(path):
+    """Return the XML and the compiled form (or None) of the model file with
+    the given absolute path, if a registered bundle holds it, else None.
+    """
+    if not _environment_loaded:
+        _registerEnvironment()
+    entry = _entries.get(path)
+    if entry is None:
+        return None
+    return entry[2], entry[3]
+
+
+def _registerEnvironment():
+    global _environment_loaded
+    with _lock:
+        if _environment_loaded:
+            return
+        _environment_loaded = True
+    for filename in os.environ.get("PLONE_SUPERMODEL_BUNDLES", "").split(os.pathsep):
+        if filename:
+            try:
+                registerBundle(filename)
+            except Exception:
+                logger.exception("Could not load model bundle %s", filename)
+
+
+def _packageDirectory(package):
+    try:
+        spec = importlib.util.find_spec(package)
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None or not spec.submodule_search_locations:
+        logger.debug("Package %s of bundled models not found", package)
+        return None
+    return os.path.abspath(list(spec.submodule_search_locations)[0])
+
+
+def _isModel(filename):
+    try:
+        return parseTree(filename).getroot().tag == f"{{{XML_NAMESPACE}}}model"
+    except Exception:
+        return False
+
+
+def build(filename, packages, compile=False):
+    """Write a bundle of the model files found in the directories of the
+    given packages, and return the keys of the bundled models.
+
+    If compile is True, the models are also parsed with the default policy
+    and stored in their parsed form. This needs the component registrations
+    of all field types and metadata handlers used by the models.
+    """
+    keys = []
+    with zipfile.ZipFile(filename, "w", zipfile.ZIP_STORED) as archive:
+        for package in packages:
+            directory = _packageDirectory(package)
+            if directory is None:
+                raise ValueError(f"Package {package} not found")
+            for root, dirs, files in os.walk(directory):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    if not name.endswith(".xml") or not _isModel(path):
+                        continue
+                    relative = os.path.relpath(path, directory)
+                    key = package + "/" + relative.replace(os.path.sep, "/")
+                    with open(path, "rb") as fd:
+                        archive.writestr(MODELS + key, fd.read())
+                    if compile:
+                        model = parse(path)
+                        archive.writestr(
+                            COMPILED + key, pickle.dumps(_compactModel(model))
+                        )
+                    keys.append(key)
+    return keys
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        prog="python -m plone.supermodel.bundle",
+        description="Pack the model files of packages into a model bundle.",
+    )
+    argparser.add_argument("output", help="bundle file to write")
+    argparser.add_argument("packages", nargs="+", help="packages to bundle")
+    argparser.add_argument(
+        "--compile", action="store_true", help="also store the parsed models"
+    )
+    argparser.add_argument(
+        "--zcml",
+        action="append",
+        default=[],
+        metavar="PACKAGE",
+        help="load the configure.zcml of the package before compiling",
+    )
+    args = argparser.parse_args(argv)
+
+    if args.compile:
+        configure(args.zcml)
+
+    keys = build(args.output, args.packages, compile=args.compile)
+    print(f"Bundled {len(keys)} models into {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""Generate Python modules from models.
+
+generate() turns a model into the source of a Python module that defines an
+equivalent model.Schema subclass for each schema of the model, and a MODEL
+holding them like the model returned by loadFile(). Importing the generated,
+byte compiled module is cheaper than parsing the model file, and its
+schemata serialize to equivalent XML.
+
+Objects the model refers to by dotted name, like bases, invariants, default
+factories and sources, are imported by the generated module. Generate a
+module with::
+
+    python -m plone.supermodel.codegen [--zcml PACKAGE] MODEL [OUTPUT]
+"""
+
+from collections import OrderedDict
+from decimal import Decimal
+from lxml import etree
+from plone.supermodel.interfaces import DEFAULT_ORDER
+from plone.supermodel.interfaces import FIELDSETS_KEY
+from plone.supermodel.interfaces import FILENAME_KEY
+from plone.supermodel.interfaces import IFieldExportImportHandler
+from plone.supermodel.interfaces import IFieldNameExtractor
+from plone.supermodel.interfaces import SCHEMA_NAME_KEY
+from plone.supermodel.model import Schema
+from plone.supermodel.parser import parse
+from plone.supermodel.parser import parseTree
+from plone.supermodel.utils import configure
+from plone.supermodel.utils import resolveDottedName
+from plone.supermodel.utils import sortedFields
+from zope.component import queryUtility
+from zope.i18nmessageid import Message
+from zope.interface import directlyProvidedBy
+from zope.schema import getFields
+from zope.schema.interfaces import IChoice
+from zope.schema.interfaces import IField
+from zope.schema.vocabulary import SimpleTerm
+from zope.schema.vocabulary import SimpleVocabulary
+
+import argparse
+import datetime
+import keyword
+import math
+import os
+import py_compile
+import sys
+import types
+
+# Tagged values that are written as directives, or that would make the
+# generated schemata load the model file again.
+_skippedTaggedValues = frozenset(
+    [FIELDSETS_KEY, "invariants", FILENAME_KEY, SCHEMA_NAME_KEY]
+)
+
+_fieldsetAttributes = frozenset(["__name__", "label", "description", "fields", "order"])
+
+# Elements whose text is the dotted name of an object
+_referenceElements = frozenset(["defaultFactory", "invariant", "source"])
+
+
+def className(schemaName):
+    """Return the name of the class generated for the named schema, e.g.
+    ISchema for the default schema and IEditForm for "edit-form".
+    """
+    parts = "".join(c if c.isalnum() else " " for c in schemaName).split()
+    return "I" + ("".join(part[:1].upper() + part[1:] for part in parts) or "Schema")
+
+
+def references(source):
+    """Return the objects the model in the source file refers to by dotted
+    name, like sources and default factories, in a dict by dotted name.
+    Names that cannot be resolved are left out.
+    """
+    dottedNames = set()
+    for element in parseTree(source).getroot().iter(etree.Element):
+        based_on = element.get("based-on")
+        if based_on is not None:
+            dottedNames.update(based_on.split())
+        if etree.QName(element).localname in _referenceElements and element.text:
+            dottedNames.add(element.text.strip())
+
+    found = {}
+    for dotted in sorted(dottedNames):
+        try:
+            found[dotted] = resolveDottedName(dotted)
+        except (ImportError, AttributeError, ValueError):
+            continue
+    return found
+
+
+class _ModuleWriter:
+    def __init__(self, references=None):
+        self.imports = {"plone.supermodel.model", "zope.interface"}
+        self.handlers = {}
+        self.references = {
+            id(obj): dotted for dotted, obj in (references or {}).items()
+        }
+
+    def reference(self, obj):
+        """Return a dotted name that the generated module can use for obj,
+        and remember the module to import.
+        """
+        module = getattr(obj, "__module__", None)
+        name = getattr(obj, "__qualname__", None) or getattr(obj, "__name__", None)
+        if isinstance(module, str) and isinstance(name, str) and "<" not in name:
+            # Prefer the shortest name, e.g. zope.schema.TextLine over
+            # zope.schema._bootstrapfields.TextLine
+            parts = module.split(".")
+            for i in range(1, len(parts) + 1):
+                modname = ".".join(parts[:i])
+                try:
+                    found = resolveDottedName(f"{modname}.{name}")
+                except (ImportError, AttributeError):
+                    continue
+                if found is obj:
+                    self.imports.add(modname)
+                    return f"{modname}.{name}"
+
+        # Objects without a name of their own, like sources, can still be
+        # found under the dotted name the model referred to them by.
+        dotted = self.references.get(id(obj))
+        if dotted is not None:
+            parts = dotted.split(".")
+            for i in range(len(parts) - 1, 0, -1):
+                modname = ".".join(parts[:i])
+                if isinstance(sys.modules.get(modname), types.ModuleType):
+                    self.imports.add(modname)
+                    return dotted
+
+        raise NotImplementedError(f"Cannot refer to {obj!r} by a dotted name")
+
+    def value(self, value, indent=""):
+        """Return a Python expression for the value."""
+        if value is None or isinstance(value, (bool, int, bytes)):
+            return repr(value)
+        if isinstance(value, float):
+            if math.isfinite(value):
+                return repr(value)
+            return f"float({str(value)!r})"
+        if isinstance(value, Message):
+            arguments = [repr(str(value))]
+            for name in ("domain", "default", "mapping", "msgid_plural"):
+                attribute = getattr(value, name, None)
+                if attribute is not None:
+                    arguments.append(f"{name}={self.value(attribute)}")
+            self.imports.add("zope.i18nmessageid")
+            return f"zope.i18nmessageid.Message({', '.join(arguments)})"
+        if isinstance(value, str):
+            return repr(str(value))
+        if isinstance(value, Decimal):
+            self.imports.add("decimal")
+            return f"decimal.Decimal({str(value)!r})"
+        if isinstance(value, (datetime.date, datetime.time, datetime.timedelta)):
+            tzinfo = getattr(value, "tzinfo", None)
+            if tzinfo is None or isinstance(tzinfo, datetime.timezone):
+                self.imports.add("datetime")
+                return repr(value)
+        if IField.providedBy(value):
+            return self.field(value, indent)
+
+        kind = type(value)
+        if kind is list:
+            return "[" + ", ".join(self.value(item) for item in value) + "]"
+        if kind is tuple:
+            items = [self.value(item) for item in value]
+            if len(items) == 1:
+                return f"({items[0]},)"
+            return "(" + ", ".join(items) + ")"
+        if kind in (set, frozenset):
+            items = sorted(self.value(item) for item in value)
+            if kind is set and items:
+                return "{" + ", ".join(items) + "}"
+            return f"{kind.__name__}([{', '.join(items)}])"
+        if kind in (dict, OrderedDict):
+            items = ", ".join(
+                f"{self.value(key)}: {self.value(item)}" for key, item in value.items()
+            )
+            if kind is dict:
+                return "{" + items + "}"
+            self.imports.add("collections")
+            return "collections.OrderedDict({" + items + "})"
+
+        return self.reference(value)
+
+    def field(self, field, indent=""):
+        """Return a Python expression constructing a field like the given
+        one, with the attributes its field handler would write.
+        """
+        fieldType = IFieldNameExtractor(field)()
+        handler = self.handlers.get(fieldType, None)
+        if handler is None:
+            handler = self.handlers[fieldType] = queryUtility(
+                IFieldExportImportHandler, name=fieldType
+            )
+            if handler is None:
+                raise ValueError(f"Field type {fieldType} is not supported")
+
+        arguments = []
+        for name in sorted(handler.fieldAttributes):
+            if name == "order" or (
+                # The default is computed by the factory
+                name == "default"
+                and field.defaultFactory is not None
+            ):
+                continue
+            if "w" in handler.filteredAttributes.get(name, "") and (
+                name != "defaultFactory"
+            ):
+                continue
+            attributeField = handler.fieldAttributes[name]
+            value = attributeField.bind(field).get(field)
+            if value == attributeField.default:
+                continue
+            arguments.append((name, self.value(value, indent + "    ")))
+
+        if IChoice.providedBy(field):
+            arguments.append(self.vocabulary(field, indent + "    "))
+
+        expression = self.reference(type(field))
+        if not arguments:
+            return expression + "()"
+        lines = [f"{indent}    {name}={value}," for name, value in arguments]
+        return "\n".join([expression + "("] + lines + [indent + ")"])
+
+    def vocabulary(self, field, indent):
+        if field.vocabularyName is not None:
+            return "vocabulary", repr(field.vocabularyName)
+
+        vocabulary = field.vocabulary
+        if type(vocabulary) is not SimpleVocabulary:
+            return "source", self.reference(vocabulary)
+
+        terms = list(vocabulary)
+        if all(
+            term.title is None and term.token == SimpleTerm(term.value).token
+            for term in terms
+        ):
+            return "values", self.value([term.value for term in terms])
+
+        self.imports.add("zope.schema.vocabulary")
+        lines = [
+            f"{indent}    zope.schema.vocabulary.SimpleTerm("
+            f"{self.value(term.value)}, {self.value(term.token)}, "
+            f"{self.value(term.title)}),"
+            for term in terms
+        ]
+        return "vocabulary", "\n".join(
+            ["zope.schema.vocabulary.SimpleVocabulary(["] + lines + [indent + "])"]
+        )
+
+    def schema(self, schema, name):
+        bases = []
+        baseFields = {}
+        for base in schema.__bases__:
+            if base is Schema:
+                bases.append("plone.supermodel.model.Schema")
+                continue
+            bases.append(self.reference(base))
+            for fieldName, field in getFields(base).items():
+                baseFields[fieldName] = (bases[-1], field)
+
+        body = []
+        for invariant in schema.queryDirectTaggedValue("invariants", []):
+            body.append(f"zope.interface.invariant({self.reference(invariant)})")
+
+        for tag in sorted(schema.getDirectTaggedValueTags()):
+            if tag in _skippedTaggedValues:
+                continue
+            value = self.value(schema.getDirectTaggedValue(tag))
+            body.append(f"zope.interface.taggedValue({tag!r}, {value})")
+
+        for fieldset in schema.queryDirectTaggedValue(FIELDSETS_KEY, []):
+            arguments = [repr(fieldset.__name__)]
+            if fieldset.label != fieldset.__name__:
+                arguments.append(f"label={self.value(fieldset.label)}")
+            if fieldset.description is not None:
+                arguments.append(f"description={self.value(fieldset.description)}")
+            if fieldset.order != DEFAULT_ORDER:
+                arguments.append(f"order={fieldset.order!r}")
+            arguments.append(f"fields={self.value(list(fieldset.fields))}")
+            for attribute, value in sorted(vars(fieldset).items()):
+                if attribute not in _fieldsetAttributes:
+                    arguments.append(f"{attribute}={self.value(value)}")
+            body.append(
+                "plone.supermodel.model.fieldset(\n"
+                + "".join(f"        {argument},\n" for argument in arguments)
+                + "    )"
+            )
+
+        after = []
+        for fieldName, field in sortedFields(schema):
+            if not fieldName.isidentifier() or keyword.iskeyword(fieldName):
+                raise NotImplementedError(
+                    f"Field name {fieldName!r} is not a Python identifier"
+                )
+            body.append(f"{fieldName} = {self.field(field, '    ')}")
+            # A field overriding one of a base keeps the order of the base
+            # field, like when the model is parsed
+            base, baseField = baseFields.get(fieldName, (None, None))
+            if baseField is not None and baseField.order == field.order:
+                after.append(
+                    f"{name}[{fieldName!r}].order = {base}[{fieldName!r}].order"
+                )
+            for iface in directlyProvidedBy(field):
+                after.append(
+                    f"zope.interface.alsoProvides({name}[{fieldName!r}], "
+                    f"{self.reference(iface)})"
+                )
+
+        lines = [f"class {name}({', '.join(bases)}):"]
+        lines.extend(f"    {statement}" for statement in body or ["pass"])
+        if after:
+            lines.append("")
+            lines.extend(after)
+        return "\n".join(lines)
+
+
+def generate(model, names=None, origin=None, references=None):
+    """Return the source of a Python module defining the schemata of the
+    model as model.Schema subclasses, and the model itself as MODEL.
+
+    names maps schema names to class names, by default see className().
+    origin, e.g. the name of the model file, is mentioned in the header.
+    references maps dotted names to the objects the model refers to by
+    them, see references(); objects without a name of their own, like
+    sources, can only be imported by these names.
+    Raises NotImplementedError for values that cannot be written as Python,
+    like objects that cannot be imported by name.
+    """
+    names = names or {}
+    writer = _ModuleWriter(references)
+    classes = {}
+    definitions = []
+    for schemaName, schema in model.schemata.items():
+        name = classes[schemaName] = names.get(schemaName) or className(schemaName)
+        definitions.append(writer.schema(schema, name))
+
+    header = "# Generated by plone.supermodel.codegen"
+    if origin:
+        header += f" from {origin}"
+    items = "".join(f"        {key!r}: {name},\n" for key, name in classes.items())
+    return "\n".join(
+        [header + ", do not edit.", ""]
+        + [f"import {module}" for module in sorted(writer.imports)]
+        + [""]
+        + [f"\n{definition}\n" for definition in definitions]
+        + [
+            "",
+            "MODEL = plone.supermodel.model.Model(",
+            "    {",
+            items + "    }",
+            ")",
+            "",
+        ]
+    )
+
+
+def compileFile(filename, output=None, policy="", names=None):
+    """Parse the model file, write the module generated for it to output,
+    by default next to the model file with the .py extension, and byte
+    compile it. Return the name of the written module.
+    """
+    if output is None:
+        output = os.path.splitext(filename)[0] + ".py"
+    source = generate(
+        parse(filename, policy=policy),
+        names,
+        origin=os.path.basename(filename),
+        references=references(filename),
+    )
+    with open(output, "w", encoding="utf-8") as fd:
+        fd.write(source)
+    py_compile.compile(output, doraise=True)
+    return output
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        prog="python -m plone.supermodel.codegen",
+        description="Generate a Python module from a model file.",
+    )
+    argparser.add_argument("model", help="model file to read")
+    argparser.add_argument(
+        "output", nargs="?", help="module to write, by default next to the model"
+    )
+    argparser.add_argument(
+        "--zcml",
+        action="append",
+        default=[],
+        metavar="PACKAGE",
+        help="load the configure.zcml of the package before parsing",
+    )
+    args = argparser.parse_args(argv)
+
+    configure(args.zcml)
+    output = compileFile(args.model, args.output)
+    print(f"Generated {output} from {args.model}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
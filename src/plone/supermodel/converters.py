@@ -1,7 +1,7 @@
 from plone.supermodel.interfaces import IToUnicode
 from plone.supermodel.utils import fieldTypecast
+from plone.supermodel.utils import resolveDottedName
 from zope.component import adapter
-from zope.dottedname.resolve import resolve
 from zope.interface import implementer
 from zope.schema.interfaces import IBytes
 from zope.schema.interfaces import IDate
@@ -82,7 +82,7 @@ class InterfaceFieldFromUnicode:
         self.context = context
 
     def fromUnicode(self, value):
-        iface = resolve(value)
+        iface = resolveDottedName(value)
         self.context.validate(iface)
         return iface
 
@@ -109,7 +109,7 @@ class ObjectFromUnicode:
         self.context = context
 
     def fromUnicode(self, value):
-        obj = resolve(value)
+        obj = resolveDottedName(value)
         self.context.validate(obj)
         return obj
 
@@ -1,14 +1,141 @@
-import threading
+from contextlib import contextmanager
 
+import contextvars
 
-class SupermodelParseInfo(threading.local):
-    def __getattr__(self, name):
-        if name == "stack":
-            self.stack = [None]
-            return self.stack
-        if name == "i18n_domain":
-            return self.__dict__.get("i18n_domain")
-        return self.__dict__[name]
+
+class ParseContext:
+    """State of a parse in progress.
+
+    ``stack`` holds the elements being read, the last one is used to report
+    the location of an error. It is None if elements are not tracked, see
+    parser.parse(fast=True). ``i18n_domain`` is the default domain for
+    translatable values. ``element`` is the element an error happened at,
+    if it was found by building a schema again in diagnostic mode.
+    """
+
+    __slots__ = ("stack", "i18n_domain", "element")
+
+    def __init__(self, i18n_domain=None, track=True):
+        self.stack = [None] if track else None
+        self.i18n_domain = i18n_domain
+        self.element = None
+
+    def track(self, elements):
+        """Iterate over the elements, pushing each one onto the stack while
+        it is being read.
+
+        If reading an element raises an exception, it is left on the stack so
+        that the error can be reported. The stack goes away with the context.
+        """
+        if self.stack is None:
+            return elements
+        return self._track(elements)
+
+    def _track(self, elements):
+        stack = self.stack
+        for element in elements:
+            stack.append(element)
+            yield element
+            stack.pop()
+
+    def current(self):
+        """Return the element being read or the element an error was found
+        at, or None.
+        """
+        if self.stack is None:
+            return self.element
+        return self.stack[-1]
+
+
+_parse_context = contextvars.ContextVar("plone.supermodel.parse_context")
+
+
+def parseContext():
+    """Return the context of the parse in progress in the current thread or
+    asyncio task. Outside of a parse, return a new context that is not kept.
+    """
+    context = _parse_context.get(None)
+    if context is None:
+        context = ParseContext()
+    return context
+
+
+@contextmanager
+def parsing(i18n_domain=None, track=True):
+    """Run the block with a new parse context, restoring the previous one
+    afterwards.
+    """
+    context = ParseContext(i18n_domain, track)
+    token = _parse_context.set(context)
+    try:
+        yield context
+    finally:
+        _parse_context.reset(token)
+        # Do not keep the elements (and their documents) alive through
+        # references to the context, e.g. from a traceback.
+        context.stack = None
+
+
+class _UntrackedStack:
+    """Stands in for the element stack outside of a parse and in a parse that
+    does not track elements: pushing does nothing, and the current element
+    is None.
+    """
+
+    __slots__ = ()
+
+    def append(self, element):
+        pass
+
+    def pop(self, index=-1):
+        return None
+
+    def __getitem__(self, index):
+        return None
+
+    def __len__(self):
+        return 0
+
+    def __iter__(self):
+        return iter(())
+
+    def __bool__(self):
+        return False
+
+
+_untracked = _UntrackedStack()
+
+
+class SupermodelParseInfo:
+    """Backwards compatible access to the context of the parse in progress.
+
+    Outside of a parse, and in a parse that does not track elements, the
+    stack ignores pushes, so that no elements are kept alive. Setting values
+    outside of a parse has no effect.
+    """
+
+    @property
+    def stack(self):
+        context = _parse_context.get(None)
+        if context is None or context.stack is None:
+            return _untracked
+        return context.stack
+
+    @stack.setter
+    def stack(self, value):
+        context = _parse_context.get(None)
+        if context is not None:
+            context.stack = value
+
+    @property
+    def i18n_domain(self):
+        return parseContext().i18n_domain
+
+    @i18n_domain.setter
+    def i18n_domain(self, value):
+        context = _parse_context.get(None)
+        if context is not None:
+            context.i18n_domain = value
 
 
 parseinfo = SupermodelParseInfo()
@@ -7,6 +7,7 @@ from plone.supermodel.interfaces import ISchemaPlugin
 from plone.supermodel.interfaces import PRIMARY_FIELDS_KEY
 from plone.supermodel.interfaces import SCHEMA_NAME_KEY
 from plone.supermodel.model import Fieldset
+from plone.supermodel.utils import modelFilename
 from plone.supermodel.utils import syncSchema
 from zope.component import adapter
 from zope.interface import alsoProvides
@@ -14,7 +15,6 @@ from zope.interface import implementer
 from zope.interface.interface import Element
 from zope.interface.interface import TAGGED_DATA
 
-import os.path
 import sys
 
 # Directive
@@ -137,17 +137,14 @@ class load(Directive):
 @implementer(ISchemaPlugin)
 class SupermodelSchemaPlugin:
     order = -1000
+    taggedValueKeys = (FILENAME_KEY,)
 
     def __init__(self, interface):
         self.interface = interface
 
     def __call__(self):
         interface = self.interface
-        filename = Element.queryTaggedValue(
-            interface,
-            FILENAME_KEY,
-            default=None,
-        )
+        filename = modelFilename(interface)
         if filename is None:
             return
         schema = Element.queryTaggedValue(
@@ -156,27 +153,7 @@ class SupermodelSchemaPlugin:
             default="",
         )
 
-        moduleName = interface.__module__
-        module = sys.modules.get(moduleName, None)
-
-        directory = moduleName
-
-        if hasattr(module, "__path__"):
-            directory = module.__path__[0]
-        else:
-            while "." in moduleName:
-                moduleName, _ = moduleName.rsplit(".", 1)
-                module = sys.modules.get(moduleName, None)
-                if hasattr(module, "__path__"):
-                    directory = module.__path__[0]
-                    break
-
-        directory = os.path.abspath(directory)
-        # Let / act as path separator on all platforms
-        filename = filename.replace("/", os.path.sep)
-        filename = os.path.abspath(os.path.join(directory, filename))
-
-        model = loadFile(filename)
+        model = loadFile(filename, lazy=True)
         if schema not in model.schemata:
             raise ValueError(
                 'Schema "{}" specified for interface {} does not exist '
@@ -187,7 +164,11 @@ class SupermodelSchemaPlugin:
                 )
             )
 
-        syncSchema(model.schemata[schema], interface, overwrite=False)
+        source = model.schemata[schema]
+        if source is interface:
+            # The interface was itself loaded from this file
+            return
+        syncSchema(source, interface, overwrite=False)
 
 
 class fieldset(MetadataListDirective):
@@ -212,6 +193,7 @@ class fieldset(MetadataListDirective):
 
 class FieldsetCheckerPlugin(CheckerPlugin):
     key = FIELDSETS_KEY
+    taggedValueKeys = (FIELDSETS_KEY,)
 
     def fieldNames(self):
         if self.value is None:
@@ -238,6 +220,7 @@ else:
 
     class PrimaryFieldsPlugin(ListCheckerPlugin):
         key = PRIMARY_FIELDS_KEY
+        taggedValueKeys = (PRIMARY_FIELDS_KEY,)
 
         def __call__(self):
             schema = self.schema
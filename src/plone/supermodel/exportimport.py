@@ -1,12 +1,16 @@
 from lxml import etree
-from plone.supermodel.debug import parseinfo
+from plone.supermodel.debug import parseContext
+from plone.supermodel.interfaces import I18N_NAMESPACE
 from plone.supermodel.interfaces import IDefaultFactory
 from plone.supermodel.interfaces import IFieldExportImportHandler
 from plone.supermodel.interfaces import IFieldNameExtractor
 from plone.supermodel.utils import elementToValue
+from plone.supermodel.utils import internString
 from plone.supermodel.utils import noNS
+from plone.supermodel.utils import ns
 from plone.supermodel.utils import valueToElement
 from zope.component import queryUtility
+from zope.i18nmessageid import Message
 from zope.interface import implementedBy
 from zope.interface import implementer
 from zope.interface import Interface
@@ -16,6 +20,7 @@ from zope.schema.interfaces import IVocabularyTokenized
 from zope.schema.vocabulary import SimpleTerm
 from zope.schema.vocabulary import SimpleVocabulary
 
+import threading
 import zope.schema
 
 try:
@@ -24,6 +29,9 @@ except ImportError:
     from zope.schema.vocabulary import OrderedDict  # <py27
 
 
+_construct_lock = threading.Lock()
+
+
 class OrderedDictField(zope.schema.Dict):
     _type = OrderedDict
 
@@ -80,16 +88,19 @@ class BaseHandler:
         )
 
     def _constructField(self, attributes):
-        return self.klass(**attributes)
+        # zope.schema numbers fields with an unlocked class counter, which
+        # concurrent parses could otherwise interleave or lose updates of.
+        with _construct_lock:
+            return self.klass(**attributes)
 
     def read(self, element):
         """Read a field from the element and return a new instance"""
         attributes = {}
         deferred = {}
         deferred_nonvalidated = {}
+        track = parseContext().track
 
-        for attribute_element in element.iterchildren(tag=etree.Element):
-            parseinfo.stack.append(attribute_element)
+        for attribute_element in track(element.iterchildren(tag=etree.Element)):
             attribute_name = noNS(attribute_element.tag)
 
             if "r" in self.filteredAttributes.get(attribute_name, ""):
@@ -121,11 +132,10 @@ class BaseHandler:
                     attributes[attribute_name] = self.readAttribute(
                         attribute_element, attributeField
                     )
-            parseinfo.stack.pop()
 
         name = element.get("name")
         if name is not None:
-            name = str(name)
+            name = internString(str(name))
             attributes["__name__"] = name
 
         field_instance = self._constructField(attributes)
@@ -135,29 +145,29 @@ class BaseHandler:
 
         # Handle those elements that can only be set up once the field is
         # constructed, in the preferred order.
-        for attribute_name in self.fieldTypeAttributes:
-            if attribute_name in deferred:
-                attribute_element = deferred[attribute_name]
-                parseinfo.stack.append(attribute_element)
-                value = self.readAttribute(attribute_element, field_instance)
-                setattr(field_instance, attribute_name, value)
-                parseinfo.stack.pop()
-
-        for attribute_name in self.nonValidatedfieldTypeAttributes:
-            if attribute_name in deferred_nonvalidated:
-                # this is pretty nasty: we need the field's fromUnicode(),
-                # but this always validates. The missing_value field may by
-                # definition be invalid. Therefore, we need to fake it.
-
-                clone = self.klass.__new__(self.klass)
-                clone.__dict__.update(field_instance.__dict__)
-                clone.__dict__["validate"] = lambda value: True
-
-                attribute_element = deferred_nonvalidated[attribute_name]
-                parseinfo.stack.append(attribute_element)
-                value = self.readAttribute(attribute_element, clone)
-                setattr(field_instance, attribute_name, value)
-                parseinfo.stack.pop()
+        for attribute_element in track(
+            deferred[name] for name in self.fieldTypeAttributes if name in deferred
+        ):
+            attribute_name = noNS(attribute_element.tag)
+            value = self.readAttribute(attribute_element, field_instance)
+            setattr(field_instance, attribute_name, value)
+
+        for attribute_element in track(
+            deferred_nonvalidated[name]
+            for name in self.nonValidatedfieldTypeAttributes
+            if name in deferred_nonvalidated
+        ):
+            attribute_name = noNS(attribute_element.tag)
+            # this is pretty nasty: we need the field's fromUnicode(),
+            # but this always validates. The missing_value field may by
+            # definition be invalid. Therefore, we need to fake it.
+
+            clone = self.klass.__new__(self.klass)
+            clone.__dict__.update(field_instance.__dict__)
+            clone.__dict__["validate"] = lambda value: True
+
+            value = self.readAttribute(attribute_element, clone)
+            setattr(field_instance, attribute_name, value)
 
         field_instance._init_field = False
 
@@ -351,35 +361,7 @@ class ChoiceHandler(BaseHandler):
         elif field.vocabularyName is None and IVocabularyTokenized.providedBy(
             field.vocabulary
         ):
-            value = []
-            for term in field.vocabulary:
-                if isinstance(term.value, int) or (
-                    isinstance(term.value, str)
-                    and term.token.encode() == term.value.encode("unicode_escape")
-                ):
-                    if term.title and term.title != term.value:
-                        value.append((term.value, term.title))
-                    else:
-                        value.append(term.value)
-                else:
-                    raise NotImplementedError(
-                        "Cannot export a vocabulary that is not "
-                        "based on a simple list of values"
-                    )
-
-            attributeField = self.fieldAttributes["values"]
-            if any(map(lambda v: isinstance(v, tuple), value)):
-
-                def _pair(v):
-                    return v if len(v) == 2 else (v[0],) * 2
-
-                value = OrderedDict(map(_pair, value))
-                attributeField = OrderedDictField(
-                    key_type=zope.schema.TextLine(),
-                    value_type=zope.schema.TextLine(),
-                )
-            child = valueToElement(attributeField, value, name="values", force=True)
-            element.append(child)
+            element.append(self.writeValues(field.vocabulary))
 
         # Anything else is not allowed - we can't export ISource/IVocabulary or
         #  IContextSourceBinder objects.
@@ -391,3 +373,69 @@ class ChoiceHandler(BaseHandler):
             )
 
         return element
+
+    def writeValues(self, vocabulary):
+        """Create and return a <values /> element for a vocabulary based on a
+        simple list of values.
+
+        This is equivalent to converting the terms to a list (or, if any term
+        has a distinct title, a dict of value to title) and passing it to
+        valueToElement(), but builds the elements in a single pass over the
+        terms, which matters for very large inline vocabularies.
+        """
+        items = []
+        titled = False
+        for term in vocabulary:
+            value = term.value
+            if not (
+                isinstance(value, int)
+                or (
+                    isinstance(value, str)
+                    and term.token.encode() == value.encode("unicode_escape")
+                )
+            ):
+                raise NotImplementedError(
+                    "Cannot export a vocabulary that is not "
+                    "based on a simple list of values"
+                )
+            title = term.title
+            if title and title != value:
+                titled = True
+            else:
+                title = value
+            items.append((value, title))
+
+        element = etree.Element("values")
+        if titled:
+            for value, title in sorted(OrderedDict(items).items()):
+                child = etree.Element("element")
+                _setText(child, title)
+                child.attrib["key"] = _toUnicode(value)
+                element.append(child)
+        else:
+            for value, title in items:
+                child = etree.Element("element")
+                _setText(child, value)
+                element.append(child)
+        return element
+
+
+def _toUnicode(value):
+    # The same conversion DefaultToUnicode applies to the text fields used
+    # for the values of a vocabulary.
+    if isinstance(value, bytes):
+        return value.decode()
+    return str(value)
+
+
+def _setText(element, value):
+    # Inline equivalent of valueToElement() for a text value, including
+    # i18n messages.
+    element.text = _toUnicode(value)
+    if isinstance(value, Message):
+        element.set(ns("domain", I18N_NAMESPACE), value.domain)
+        if not value.default:
+            element.set(ns("translate", I18N_NAMESPACE), "")
+        else:
+            element.set(ns("translate", I18N_NAMESPACE), element.text)
+            element.text = _toUnicode(value.default)
@@ -74,6 +74,14 @@ class ISchemaPlugin(Interface):
         title="Order", required=False, description="Sort key for plugin execution order"
     )
 
+    taggedValueKeys = zope.schema.Tuple(
+        title="Tagged value keys",
+        required=False,
+        description="If set on the plugin factory, the plugin is only used "
+        "for schemata that directly carry at least one of these tagged values",
+        value_type=zope.schema.TextLine(),
+    )
+
     def __call__():
         """Execute plugin"""
 
@@ -106,7 +114,7 @@ class IXMLToSchema(Interface):
         Raises an IOError if the file cannot be opened.
         """
 
-    def loadFile(filename, reload=False, policy=""):
+    def loadFile(filename, reload=False, policy="", lazy=False):
         """Return an IModel as contained in the given XML file, which is read
         relative to the current module (unless it is an absolute path).
 
@@ -114,10 +122,42 @@ class IXMLToSchema(Interface):
         is given, it can be used to select a custom schema parsing policy.
         Policies must be registered as named utilities providing
         ISchemaPolicy.
+
+        If lazy is True, each schema in the file is only built the first
+        time it is looked up in the model's schemata, and errors in a schema
+        are reported at that point.
+        """
+
+    def aloadFile(filename, reload=False, policy="", lazy=False, executor=None):
+        """Return an awaitable for loadFile() that parses the file in the
+        given executor, by default the one of the running event loop.
+        """
+
+    def preloadModels(sources=None, policy="", workers=None):
+        """Read and parse the given model files, or the model files of the
+        given interfaces as named with the load directive, in parallel and
+        add them to the cache used by loadFile(). By default, the files of
+        all schemata are preloaded. Return the paths that were loaded.
+        """
+
+    def reloadChangedModels(paths=None, policy=""):
+        """Parse the model files in the loadFile() cache again if their
+        contents changed since they were loaded. Return the paths that were
+        reloaded.
+        """
+
+    def loadString(model, policy="", schemata=None):
+        """Load a model from a string rather than a file.
+
+        If schemata is given, it is a collection of schema names: only those
+        schemata are built and included in the returned model.
         """
 
-    def loadString(model, policy=""):
-        """Load a model from a string rather than a file."""
+    def loadElement(element, policy="", schemata=None):
+        """Load a model from an already parsed <model /> lxml element, for
+        example one embedded in a larger XML document. The element is used
+        as it is, without serializing and parsing it again.
+        """
 
     def serializeSchema(schema, name=""):
         """Return an XML string representing the given schema interface. This
@@ -129,6 +169,12 @@ class IXMLToSchema(Interface):
         the loadFile() or loadString() method.
         """
 
+    def serializeModelElement(model, parent=None):
+        """Return an lxml <model /> element representing the given model. If
+        parent is given, the element is appended to it. This avoids the
+        string round trip when embedding a model in another XML document.
+        """
+
 
 class ISchemaPolicy(Interface):
     """A utility that provides some basic attributes of the generated
@@ -162,7 +208,8 @@ class IFieldExportImportHandler(Interface):
 class ISchemaMetadataHandler(Interface):
     """A third party application can register named utilities providing this
     interface. For each schema that is parsed in a model, the read() method
-    will be called.
+    will be called. If the handler has a namespace, it is only called for
+    schemata that use it in the <schema /> element or its descendants.
     """
 
     namespace = zope.schema.URI(
@@ -173,6 +220,15 @@ class ISchemaMetadataHandler(Interface):
         title="Preferred XML schema namespace for serialisation", required=False
     )
 
+    taggedValueKeys = zope.schema.Tuple(
+        title="Tagged value keys",
+        required=False,
+        description="If set, the handler is only asked to write metadata for "
+        "schemata that carry at least one of these tagged values, directly "
+        "or in a base",
+        value_type=zope.schema.TextLine(),
+    )
+
     def read(schemaNode, schema):
         """Called once the schema in the given <schema /> node has been
         read. schema is the schema interface that was read.
@@ -188,7 +244,8 @@ class ISchemaMetadataHandler(Interface):
 class IFieldMetadataHandler(Interface):
     """A third party application can register named utilities providing this
     interface. For each field that is parsed in a schema, the read() method
-    will be called.
+    will be called. If the handler has a namespace, it is only called for
+    fields that use it in the <field /> element or its descendants.
     """
 
     namespace = zope.schema.URI(
@@ -198,6 +255,15 @@ class IFieldMetadataHandler(Interface):
         title="Preferred XML schema namespace for serialisation", required=False
     )
 
+    taggedValueKeys = zope.schema.Tuple(
+        title="Tagged value keys",
+        required=False,
+        description="If set, the handler is only asked to write metadata for "
+        "schemata that carry at least one of these tagged values, directly "
+        "or in a base",
+        value_type=zope.schema.TextLine(),
+    )
+
     def read(fieldNode, schema, field):
         """Called once the field in the given <field /> node has been
         read. field is the field instance that was read. schema is the schema
@@ -1,14 +1,24 @@
+from collections.abc import MutableMapping
 from plone.supermodel.interfaces import DEFAULT_ORDER
+from plone.supermodel.interfaces import FIELDSETS_KEY
 from plone.supermodel.interfaces import IFieldset
 from plone.supermodel.interfaces import IModel
 from plone.supermodel.interfaces import ISchema
 from plone.supermodel.interfaces import ISchemaPlugin
-from zope.component import getAdapters
+from types import MappingProxyType
+from zope.component import getSiteManager
 from zope.interface import implementer
 from zope.interface import Interface
+from zope.interface import providedBy
+from zope.interface.interface import Element
 from zope.interface.interface import InterfaceClass
+from zope.interface.interfaces import ComponentLookupError
 
 import logging
+import os
+import threading
+import time
+import weakref
 import zope.deferredimport
 
 zope.deferredimport.defineFrom(
@@ -31,6 +41,18 @@ logger = logging.getLogger("plone.supermodel")
 
 @implementer(IFieldset)
 class Fieldset:
+    # Fieldsets are kept for the lifetime of their schemata. Attributes
+    # other than these, e.g. passed to the fieldset directive, go to a
+    # __dict__ that is only created when one is set.
+    __slots__ = (
+        "__name__",
+        "label",
+        "description",
+        "order",
+        "fields",
+        "__dict__",
+    )
+
     def __init__(
         self, __name__, label=None, description=None, fields=None, order=DEFAULT_ORDER
     ):
@@ -44,12 +66,146 @@ class Fieldset:
         else:
             self.fields = []
 
+    def __setstate__(self, state):
+        # Fieldsets pickled before __slots__ was used have their attributes
+        # in a dict. Newer ones have a (dict, slots) tuple.
+        if isinstance(state, tuple):
+            state, slots = state
+            state = dict(state or {}, **(slots or {}))
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def __repr__(self):
         return "<Fieldset '{}' order {:d} of {}>".format(
             self.__name__, self.order, ", ".join(self.fields)
         )
 
 
+class _Deferred:
+    __slots__ = ("factory",)
+
+    def __init__(self, factory):
+        self.factory = factory
+
+
+class LazySchemata(MutableMapping):
+    """A mapping of schema names to schemata, some of which may not have been
+    built yet.
+
+    A pending schema is added with defer(), passing a callable that returns
+    the schema. It is built the first time it is looked up and then stored
+    like any other schema. Iterating over the keys or checking for membership
+    does not build anything. Each schema is built only once, also when it is
+    looked up from several threads at the same time: building schemata,
+    loading model files and deferred finalization all happen under one
+    process-wide lock.
+    """
+
+    def __init__(self, schemata=None):
+        self._data = {}
+        self._callbacks = []
+        if schemata:
+            self._data.update(schemata)
+
+    def defer(self, name, factory):
+        """Add a schema that will be built by calling factory() on first
+        access.
+        """
+        self._data[name] = _Deferred(factory)
+
+    def apply(self, callback):
+        """Call callback(name, schema) for every schema: immediately for the
+        ones already built and as soon as they are built for the pending ones.
+        """
+        self._callbacks.append(callback)
+        for name, value in self._data.items():
+            if not isinstance(value, _Deferred):
+                callback(name, value)
+
+    def pending(self):
+        """Return the names of the schemata that have not been built yet."""
+        return [
+            name for name, value in self._data.items() if isinstance(value, _Deferred)
+        ]
+
+    def __getitem__(self, name):
+        value = self._data[name]
+        if isinstance(value, _Deferred):
+            # Building may finalize base schemata, which loads model files,
+            # so it is serialized with both under _finalize_lock
+            with _finalize_lock:
+                # Another thread may have built it while we were waiting
+                value = self._data[name]
+                if isinstance(value, _Deferred):
+                    value = value.factory()
+                    self._data[name] = value
+                    for callback in self._callbacks:
+                        callback(name, value)
+        return value
+
+    def __setitem__(self, name, schema):
+        self._data[name] = schema
+
+    def __delitem__(self, name):
+        del self._data[name]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, name):
+        return name in self._data
+
+    def __repr__(self):
+        return "<LazySchemata {} ({} pending)>".format(
+            list(self._data), len(self.pending())
+        )
+
+
+# Sorted fieldsets and field name index per schema, see sortedFieldsets()
+_fieldsets = weakref.WeakKeyDictionary()
+_fieldsets_lock = threading.Lock()
+
+
+def _fieldsetsInfo(schema):
+    fieldsets = schema.queryTaggedValue(FIELDSETS_KEY, None)
+    info = _fieldsets.get(schema)
+    if info is not None and info[0] is fieldsets:
+        return info
+
+    ordered = ()
+    index = {}
+    if fieldsets:
+        ordered = tuple(sorted(fieldsets, key=lambda fieldset: fieldset.order))
+        for fieldset in fieldsets:
+            for fieldName in fieldset.fields:
+                index[fieldName] = fieldset
+    info = (fieldsets, ordered, MappingProxyType(index))
+    with _fieldsets_lock:
+        _fieldsets[schema] = info
+    return info
+
+
+def sortedFieldsets(schema):
+    """Return the fieldsets of the schema as a tuple sorted by their order.
+    Fieldsets with the same order keep the order they were defined in.
+
+    The result is remembered until the FIELDSETS_KEY tagged value of the
+    schema is set again. Changing a fieldset in place is not noticed.
+    """
+    return _fieldsetsInfo(schema)[1]
+
+
+def fieldsetIndex(schema):
+    """Return a read-only mapping of the names of the fields in fieldsets of
+    the schema to their fieldset. A field listed in several fieldsets is
+    mapped to the last one. Remembered like sortedFieldsets().
+    """
+    return _fieldsetsInfo(schema)[2]
+
+
 @implementer(IModel)
 class Model:
     def __init__(self, schemata=None):
@@ -64,37 +220,180 @@ class Model:
         return self.schemata.get("", None)
 
 
+# If true, creating a schema or passing it to finalizeSchemas() only marks it
+# as pending. Its schema plugins are run the first time its fields or tagged
+# values are accessed.
+DEFERRED_FINALIZE = bool(os.environ.get("PLONE_SUPERMODEL_DEFERRED_FINALIZE"))
+
+# Serializes deferred finalization, loading model files and building lazily
+# parsed schemata, see plone.supermodel.loadFile(). They call each other, so
+# a single lock keeps them free of lock ordering deadlocks.
+_finalize_lock = threading.RLock()
+
+# Schema plugin registrations, per adapter registry and per
+# specification of the schema. Each entry is only valid for the generation of
+# the registry it was computed for.
+_schema_plugins = weakref.WeakKeyDictionary()
+
+
+def schemaPlugins(schema):
+    """Return the ISchemaPlugin registrations for the given schema as a
+    tuple of (name, factory, taggedValueKeys), sorted by name.
+
+    The result is cached until the adapter registry (or one of its bases)
+    changes.
+    """
+    try:
+        registry = getSiteManager().adapters
+    except ComponentLookupError:
+        return ()
+
+    generation = (
+        weakref.ref(registry._v_lookup),
+        tuple(r._generation for r in registry.ro),
+    )
+    cached = _schema_plugins.get(registry)
+    if cached is None or cached[0] != generation:
+        cached = _schema_plugins[registry] = (generation, {})
+
+    spec = providedBy(schema)
+    plugins = cached[1].get(spec)
+    if plugins is None:
+        plugins = cached[1][spec] = tuple(
+            (name, factory, getattr(factory, "taggedValueKeys", None))
+            for name, factory in sorted(
+                registry.lookupAll((spec,), ISchemaPlugin), key=lambda item: item[0]
+            )
+        )
+    return plugins
+
+
 @implementer(ISchema)
 class SchemaClass(InterfaceClass):
+    _SchemaClass_pending = False
+    _SchemaClass_finalizing = False
+
     def __init__(self, name, bases=(), attrs=None, __doc__=None, __module__=None):
         InterfaceClass.__init__(self, name, bases, attrs, __doc__, __module__)
-        self._SchemaClass_finalize()
+        if DEFERRED_FINALIZE:
+            self._SchemaClass_pending = True
+        else:
+            self._SchemaClass_finalize()
 
     def _SchemaClass_finalize(self):
-        adapters = [
-            (getattr(adapter, "order", 0), name, adapter)
-            for name, adapter in getAdapters((self,), ISchemaPlugin)
-        ]
-        adapters.sort()
+        plugins = schemaPlugins(self)
+        tags = None
+        adapters = []
+        for name, factory, keys in plugins:
+            # Skip plugins that only act on tagged values this schema lacks
+            if keys is not None:
+                if tags is None:
+                    tags = set(Element.getTaggedValueTags(self))
+                if tags.isdisjoint(keys):
+                    continue
+            adapter = factory(self)
+            if adapter is not None:
+                adapters.append((getattr(adapter, "order", 0), name, adapter))
+        # The order is read from the adapters, which may set it per schema
+        adapters.sort(key=lambda item: item[:2])
         for order, name, adapter in adapters:
             adapter()
+        # Remember which plugins this schema was finalized with, see
+        # finalizeSchemas(incremental=True)
+        self._SchemaClass_finalized = plugins
+        self._SchemaClass_pending = False
+
+    def _SchemaClass_isFinalized(self):
+        """Return True if the schema was finalized with the plugins that
+        currently apply to it and has not had tagged values set since.
+        """
+        finalized = getattr(self, "_SchemaClass_finalized", None)
+        return finalized is not None and finalized == schemaPlugins(self)
+
+    def _SchemaClass_ensureFinalized(self):
+        """Run the schema plugins now if finalization was deferred.
+
+        Other threads wait until the plugins are done instead of seeing a
+        half finalized schema. The plugins themselves may read the schema
+        while it is still marked as pending.
+        """
+        if not self._SchemaClass_pending:
+            return
+        with _finalize_lock:
+            if not self._SchemaClass_pending or self._SchemaClass_finalizing:
+                return
+            self._SchemaClass_finalizing = True
+            try:
+                self._SchemaClass_finalize()
+            finally:
+                self._SchemaClass_finalizing = False
+                self._SchemaClass_pending = False
+
+    def setTaggedValue(self, tag, value):
+        InterfaceClass.setTaggedValue(self, tag, value)
+        self._SchemaClass_finalized = None
+        if tag == FIELDSETS_KEY:
+            # The same list may have been changed and set again
+            _fieldsets.pop(self, None)
+
+    # Accessors for fields and tagged values finalize a pending schema first.
+    # The others (__getitem__, __iter__, queryTaggedValue, ...) are based on
+    # these.
+
+    def get(self, name, default=None):
+        if self._SchemaClass_pending:
+            self._SchemaClass_ensureFinalized()
+        return InterfaceClass.get(self, name, default)
+
+    def direct(self, name):
+        if self._SchemaClass_pending:
+            self._SchemaClass_ensureFinalized()
+        return InterfaceClass.direct(self, name)
+
+    def names(self, all=False):
+        if self._SchemaClass_pending:
+            self._SchemaClass_ensureFinalized()
+        return InterfaceClass.names(self, all)
+
+    def namesAndDescriptions(self, all=False):
+        if self._SchemaClass_pending:
+            self._SchemaClass_ensureFinalized()
+        return InterfaceClass.namesAndDescriptions(self, all)
+
+    def queryDirectTaggedValue(self, tag, default=None):
+        if self._SchemaClass_pending:
+            self._SchemaClass_ensureFinalized()
+        return InterfaceClass.queryDirectTaggedValue(self, tag, default)
+
+    def getDirectTaggedValue(self, tag):
+        if self._SchemaClass_pending:
+            self._SchemaClass_ensureFinalized()
+        return InterfaceClass.getDirectTaggedValue(self, tag)
+
+    def getDirectTaggedValueTags(self):
+        if self._SchemaClass_pending:
+            self._SchemaClass_ensureFinalized()
+        return InterfaceClass.getDirectTaggedValueTags(self)
 
 
 Schema = SchemaClass("Schema", (Interface,), __module__="plone.supermodel.model")
 
 
-def finalizeSchemas(parent=Schema):
-    """Configuration action called after plone.supermodel is configured."""
-    if not isinstance(parent, SchemaClass):
-        raise TypeError(
-            "Only instances of plone.supermodel.model.SchemaClass can be " "finalized."
-        )
+def _walk(parent):
+    """Return the set of SchemaClass instances extending parent."""
+    schemas = set()
+    seen = set()
+    stack = [parent]
+    while stack:
+        schema = stack.pop()
+        if id(schema) in seen:
+            continue
+        seen.add(id(schema))
 
-    def walk(schema):
         # When we have behaviors on the Plone site root we got some shcmeas that
         # are not SchemaClasses
         if isinstance(schema, SchemaClass):
-            yield schema
+            schemas.add(schema)
 
         # This try..except is to handle AttributeError:
         # 'VerifyingAdapterLookup' object has no attribute 'dependents'.
@@ -105,14 +404,43 @@ def finalizeSchemas(parent=Schema):
             children = schema.dependents.keys()
         except AttributeError:
             children = ()
+        stack.extend(children)
+    return schemas
+
 
-        for child in children:
-            yield from walk(child)
+def finalizeSchemas(parent=Schema, incremental=None, deferred=None):
+    """Configuration action called after plone.supermodel is configured.
 
-    schemas = set(walk(parent))
+    If incremental is True, only schemata that have not been finalized with
+    the schema plugins currently registered for them, or that had tagged
+    values set since, are finalized again. It defaults to the
+    PLONE_SUPERMODEL_INCREMENTAL_FINALIZE environment variable.
+
+    If deferred is True, the schemata are only marked as pending and get
+    finalized when they are first used. It defaults to DEFERRED_FINALIZE.
+    """
+    if not isinstance(parent, SchemaClass):
+        raise TypeError(
+            "Only instances of plone.supermodel.model.SchemaClass can be " "finalized."
+        )
+    if incremental is None:
+        incremental = bool(os.environ.get("PLONE_SUPERMODEL_INCREMENTAL_FINALIZE"))
+    if deferred is None:
+        deferred = DEFERRED_FINALIZE
+    start = time.perf_counter()
+
+    schemas = _walk(parent)
+
+    finalized = 0
     for schema in sorted(schemas):
         if hasattr(schema, "_SchemaClass_finalize"):
-            schema._SchemaClass_finalize()
+            if incremental and schema._SchemaClass_isFinalized():
+                continue
+            if deferred:
+                schema._SchemaClass_pending = True
+            else:
+                schema._SchemaClass_finalize()
+            finalized += 1
         elif isinstance(schema, InterfaceClass):
             logger.warn(
                 "{}.{} is not an instance of SchemaClass. "
@@ -122,3 +450,11 @@ def finalizeSchemas(parent=Schema):
                     schema.__module__, schema.__name__
                 )
             )
+
+    if incremental:
+        logger.info(
+            "Finalized %d of %d schemata in %.3f seconds.",
+            finalized,
+            len(schemas),
+            time.perf_counter() - start,
+        )
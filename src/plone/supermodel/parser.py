@@ -1,5 +1,9 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 from lxml import etree
-from plone.supermodel.debug import parseinfo
+from plone.supermodel.debug import parseContext
+from plone.supermodel.debug import parsing
+from plone.supermodel.exportimport import _construct_lock
 from plone.supermodel.interfaces import DEFAULT_ORDER
 from plone.supermodel.interfaces import FIELDSETS_KEY
 from plone.supermodel.interfaces import I18N_NAMESPACE
@@ -9,40 +13,211 @@ from plone.supermodel.interfaces import IInvariant
 from plone.supermodel.interfaces import ISchemaMetadataHandler
 from plone.supermodel.interfaces import ISchemaPolicy
 from plone.supermodel.model import Fieldset
+from plone.supermodel.model import LazySchemata
 from plone.supermodel.model import Model
 from plone.supermodel.model import Schema
 from plone.supermodel.model import SchemaClass
+from plone.supermodel.utils import cloneField
+from plone.supermodel.utils import configure
+from plone.supermodel.utils import elementNamespaces
+from plone.supermodel.utils import getBaseFields
+from plone.supermodel.utils import internString
+from plone.supermodel.utils import mappedFile
 from plone.supermodel.utils import ns
+from plone.supermodel.utils import resolveDottedName
+from plone.supermodel.utils import sortedFields
 from zope.component import getUtilitiesFor
 from zope.component import getUtility
 from zope.component import queryUtility
-from zope.dottedname.resolve import resolve
 from zope.interface import implementer
-from zope.schema import getFields
-
+from zope.interface.interface import Element
+from zope.interface.interface import Specification
+from zope.schema import Field
+
+import asyncio
+import functools
+import gc
+import hashlib
 import linecache
+import mmap
+import os
+import pickle
 import sys
+import threading
 import traceback
+import types
 
 
 # Exception
 class SupermodelParseError(Exception):
+    """An error while parsing a model.
+
+    The original exception, the filename, the line and the tag of the
+    element the error happened at are kept as orig_exc, fname, lineno and
+    tag. The message, with the source line and the traceback of the original
+    exception, is only rendered when it is needed.
+    """
+
     def __init__(self, orig_exc, fname, element, tb):
-        msg = str(orig_exc)
-        lineno = None
+        Exception.__init__(self)
+        self.orig_exc = orig_exc
+        self.fname = fname
+        self.tag = None
+        self.lineno = None
         if hasattr(orig_exc, "lineno"):
-            lineno = orig_exc.lineno
+            self.lineno = orig_exc.lineno
         elif element is not None:
-            lineno = getattr(element, "sourceline", "unknown")
-        if fname or lineno != "unknown":
-            msg += '\n  File "{}", line {}'.format(fname or "<unknown>", lineno)
-        if fname and lineno:
-            line = linecache.getline(fname, lineno).strip()
-            msg += "\n    %s" % line
-        msg += "\n"
-        msg += "".join(traceback.format_tb(tb))
-        msg += "\n"
-        self.args = [msg]
+            self.lineno = getattr(element, "sourceline", "unknown")
+        if element is not None:
+            self.tag = element.tag
+        self._tb = tb
+        self._message = None
+
+    @property
+    def args(self):
+        return (str(self),)
+
+    def __str__(self):
+        if self._message is None:
+            fname, lineno = self.fname, self.lineno
+            msg = str(self.orig_exc)
+            if fname or lineno != "unknown":
+                msg += '\n  File "{}", line {}'.format(fname or "<unknown>", lineno)
+            if fname and lineno:
+                line = linecache.getline(fname, lineno).strip()
+                msg += "\n    %s" % line
+            msg += "\n"
+            msg += "".join(traceback.format_tb(self._tb))
+            msg += "\n"
+            self._message = msg
+            self._tb = None
+        return self._message
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({str(self)!r})"
+
+    def __reduce__(self):
+        # The original exception does not survive pickling, e.g. when the
+        # error is sent back from a parseMany() worker process.
+        return (
+            _unpickleParseError,
+            (self.__class__, (str(self),), (self.fname, self.lineno, self.tag)),
+        )
+
+
+def _unpickleParseError(cls, args, state=(None, None, None)):
+    error = Exception.__new__(cls)
+    error.orig_exc = None
+    error.fname, error.lineno, error.tag = state
+    error._tb = None
+    error._message = args[0]
+    return error
+
+
+# If true, parse() does not track the elements being read by default, see
+# parse(fast=True).
+FAST_PARSE = bool(os.environ.get("PLONE_SUPERMODEL_FAST_PARSE"))
+
+
+# If true, parseTree() lifts lxml's limits on the size of documents by
+# default.
+HUGE_TREE = bool(os.environ.get("PLONE_SUPERMODEL_HUGE_TREE"))
+
+# lxml parsers by huge_tree setting, per thread, see xmlParser()
+_parsers = threading.local()
+
+# If true, fields read from identical <field /> elements share the values of
+# their attributes, see FieldPool.
+SHARE_FIELDS = bool(os.environ.get("PLONE_SUPERMODEL_SHARE_FIELDS"))
+
+# Objects that are shared anyway and not counted by FieldPool
+_unsized = (type, types.ModuleType, types.FunctionType, Specification)
+
+
+class FieldPool:
+    """A bounded pool of template fields by definition.
+
+    A field read from a <field /> element with the same type, attributes
+    (but the name) and children as one read before, with the same i18n
+    domain and import handler, is a copy of the template field read then.
+    The copy has its own name, order, interface and tagged values, but
+    shares the values of all other attributes, like titles, vocabularies
+    and value types, with the other copies. These must not be changed in
+    place.
+
+    Once the pool holds maxsize templates, no more are added. ``hits``
+    counts the copies made and ``saved`` estimates the bytes of the
+    attribute values they share. Both may be approximate when models are
+    parsed in several threads.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.clear()
+
+    def __len__(self):
+        return len(self._templates)
+
+    def clear(self):
+        self._templates = {}
+        self.hits = 0
+        self.saved = 0
+
+    def field(self, fieldElement, fieldName, handler):
+        """Return a field for the element, read by the handler or copied
+        from a template.
+        """
+        key = self._key(fieldElement)
+        entry = self._templates.get(key)
+        if entry is None or entry[0] is not handler:
+            template = handler.read(fieldElement)
+            if len(self._templates) >= self.maxsize:
+                return template
+            entry = (handler, template, _sharedSize(template))
+            self._templates[key] = entry
+        else:
+            self.hits += 1
+            self.saved += entry[2]
+
+        field = cloneField(entry[1])
+        field.__name__ = internString(fieldName)
+        with _construct_lock:
+            Field.order += 1
+            field.order = Field.order
+        return field
+
+    def _key(self, fieldElement):
+        attributes = sorted(
+            (name, value) for name, value in fieldElement.items() if name != "name"
+        )
+        key = hashlib.sha256(repr((parseContext().i18n_domain, attributes)).encode())
+        for child in fieldElement:
+            key.update(etree.tostring(child, with_tail=False))
+        return key.digest()
+
+    def stats(self):
+        """Return the number of templates, hits and saved bytes."""
+        return {"size": len(self._templates), "hits": self.hits, "saved": self.saved}
+
+
+fieldPool = FieldPool(
+    int(os.environ.get("PLONE_SUPERMODEL_SHARE_FIELDS_MAXSIZE") or 10000)
+)
+
+
+def _sharedSize(field):
+    """Estimate the size of the values of the field's attributes."""
+    size = 0
+    seen = set()
+    stack = list(field.__dict__.values())
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _unsized):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return size
 
 
 # Helper adapters
@@ -59,32 +234,250 @@ class DefaultSchemaPolicy:
 
 
 # Algorithm
-def parse(source, policy=""):
+def parse(source=None, policy="", lazy=False, schemata=None, element=None, fast=None):
+    """Parse a model from source, which is a filename, a file-like object or
+    the model as bytes.
+
+    Alternatively, pass an already parsed <model /> lxml element as element
+    to build the model from it directly.
+
+    If fast is True, the elements being read are not tracked for error
+    reporting. A schema that fails to build is then built again with
+    tracking to find the location of the error. It defaults to FAST_PARSE.
+    """
+    if fast is None:
+        fast = FAST_PARSE
     fname = None
     if isinstance(source, str):
         fname = source
+    elif element is not None:
+        fname = element.getroottree().docinfo.URL
+
+    with parsing(track=not fast) as context:
+        try:
+            return _parse(
+                source,
+                policy,
+                lazy=lazy,
+                fname=fname,
+                schemata=schemata,
+                element=element,
+                fast=fast,
+            )
+        except Exception as e:
+            # Re-package the exception as a parse error that will get rendered
+            # with the filename and line number of the element that caused the
+            # problem. Keep the original traceback so the developer can debug
+            # where the problem happened.
+            raise SupermodelParseError(e, fname, context.current(), sys.exc_info()[2])
+
+
+async def aparse(
+    source=None, policy="", lazy=False, schemata=None, element=None, executor=None
+):
+    """Coroutine version of parse(), running the parse in the given
+    concurrent.futures executor, by default the one of the event loop.
+
+    Each parse has its own context, so concurrent tasks never see each
+    other's error locations or i18n domains.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor,
+        functools.partial(
+            parse, source, policy, lazy=lazy, schemata=schemata, element=element
+        ),
+    )
+
+
+def parseTree(source, huge_tree=None, base_url=None):
+    """Parse the XML document from source, which is a filename, a file-like
+    object or the document as bytes (or another bytes-like object, like a
+    memory mapped file), and return the lxml element tree.
+
+    A file is memory mapped rather than read. base_url is the URL of the
+    document, which defaults to the filename.
+
+    If huge_tree is True, lxml's limits on the depth and size of the
+    document are lifted. It defaults to HUGE_TREE.
+    """
+    if huge_tree is None:
+        huge_tree = HUGE_TREE
+    parser = xmlParser(huge_tree)
+    if isinstance(source, str):
+        with mappedFile(source) as buffer:
+            return parseTree(buffer, huge_tree, base_url or source)
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return etree.fromstring(source, parser=parser, base_url=base_url).getroottree()
+    return etree.parse(source, parser=parser, base_url=base_url)
+
+
+def xmlParser(huge_tree=False):
+    """Return the lxml parser used by parseTree() in this thread, creating it
+    on first use. A parser is not thread safe, but reusing it in a thread
+    saves setting it up for each document.
+    """
+    parsers = _parsers.__dict__
+    parser = parsers.get(huge_tree)
+    if parser is None:
+        # Some safety measures.
+        # We do not want to load entities, especially file:/// entities.
+        # Also discard processing instructions.
+        # xml:id attributes are not looked up, so do not index them.
+        parser = parsers[huge_tree] = etree.XMLParser(
+            resolve_entities=False,
+            remove_pis=True,
+            collect_ids=False,
+            huge_tree=huge_tree,
+        )
+    return parser
+
+
+def _deferredSchema(
+    buildSchema, schema_element, schemaName, fname, i18n_domain, fast=False
+):
+    """Return a callable that builds the schema for the given element the
+    first time it is needed, with the same context and error reporting as
+    parse().
+    """
+
+    def factory():
+        with parsing(i18n_domain, track=not fast) as context:
+            try:
+                return buildSchema(schema_element, schemaName)
+            except Exception as e:
+                raise SupermodelParseError(
+                    e, fname, context.current(), sys.exc_info()[2]
+                )
+
+    return factory
+
 
+def validate(source=None, element=None):
+    """Check the model in source, a filename, a file-like object or bytes,
+    or in the given <model /> lxml element, without building it.
+
+    The fields are read and the base schemata, invariants and fieldsets are
+    checked like parse() does, but no schema is created, so schema plugins
+    and metadata handlers do not run. Return a list with a
+    SupermodelParseError for each problem found, which is empty if the
+    model is valid.
+    """
+    fname = None
+    if isinstance(source, str):
+        fname = source
+    elif element is not None:
+        fname = element.getroottree().docinfo.URL
     try:
-        return _parse(source, policy)
+        root = element if element is not None else parseTree(source).getroot()
     except Exception as e:
-        # Re-package the exception as a parse error that will get rendered with
-        # the filename and line number of the element that caused the problem.
-        # Keep the original traceback so the developer can debug where the
-        # problem happened.
-        raise SupermodelParseError(e, fname, parseinfo.stack[-1], sys.exc_info()[2])
-
-
-def _parse(source, policy):
-    # Some safety measures.
-    # We do not want to load entities, especially file:/// entities.
-    # Also discard processing instructions.
-    parser = etree.XMLParser(resolve_entities=False, remove_pis=True)
-    tree = etree.parse(source, parser=parser)
+        return [SupermodelParseError(e, fname, None, sys.exc_info()[2])]
+
+    i18n_domain = root.attrib.get(ns("domain", prefix=I18N_NAMESPACE))
+    handlers = {}
+    errors = []
+
+    def check(element, func, *args):
+        with parsing(i18n_domain) as context:
+            context.stack.append(element)
+            try:
+                func(*args)
+            except Exception as e:
+                errors.append(
+                    SupermodelParseError(e, fname, context.current(), sys.exc_info()[2])
+                )
+
+    for schema_element in root.findall(ns("schema")):
+        schemaName = schema_element.get("name") or ""
+        for dotted in (schema_element.get("based-on") or "").split():
+            check(schema_element, resolveDottedName, dotted)
+        for subelement in schema_element:
+            if subelement.tag == ns("field"):
+                check(subelement, _readField, subelement, handlers, False)
+            elif subelement.tag == ns("fieldset"):
+                check(subelement, _fieldsetName, subelement, schemaName)
+                check(subelement, _fieldsetOrder, subelement)
+                for fieldElement in subelement.findall(ns("field")):
+                    check(fieldElement, _readField, fieldElement, handlers, False)
+            elif subelement.tag == ns("invariant"):
+                check(subelement, _invariant, subelement)
+    return errors
+
+
+def _readField(fieldElement, handlers, share=True):
+    """Return the name and a new instance of the field described by the
+    element, caching the import handlers by field type in handlers.
+    Unless share is false, the field may come from the field pool, see
+    SHARE_FIELDS.
+    """
+    fieldName = fieldElement.get("name")
+    fieldType = fieldElement.get("type")
+
+    if fieldName is None or fieldType is None:
+        raise ValueError(
+            "The attributes 'name' and 'type' are required for each "
+            "<field /> element"
+        )
+
+    handler = handlers.get(fieldType)
+    if handler is None:
+        handler = handlers[fieldType] = queryUtility(
+            IFieldExportImportHandler, name=fieldType
+        )
+        if handler is None:
+            raise ValueError(
+                "Field type {} specified for field {} is not "
+                "supported".format(fieldType, fieldName)
+            )
+
+    if SHARE_FIELDS and share:
+        return fieldName, fieldPool.field(fieldElement, fieldName, handler)
+    return fieldName, handler.read(fieldElement)
+
+
+def _fieldsetName(element, schemaName):
+    fieldset_name = element.get("name")
+    if fieldset_name is None:
+        raise ValueError(f"Fieldset in schema {schemaName} has no name")
+    return internString(fieldset_name)
+
+
+def _fieldsetOrder(element):
+    fieldset_order = element.get("order")
+    if fieldset_order is None:
+        return DEFAULT_ORDER
+    return int(fieldset_order)
+
+
+def _invariant(element):
+    invariant = resolveDottedName(element.text)
+    if not IInvariant.providedBy(invariant):
+        raise ImportError(
+            "Invariant functions must provide " "plone.supermodel.interfaces.IInvariant"
+        )
+    return invariant
+
+
+def _parse(
+    source, policy, lazy=False, fname=None, schemata=None, element=None, fast=False
+):
+    if element is not None:
+        # Use the given element as the root without copying it.
+        tree = etree.ElementTree(element)
+    else:
+        tree = parseTree(source)
     root = tree.getroot()
 
-    parseinfo.i18n_domain = root.attrib.get(ns("domain", prefix=I18N_NAMESPACE))
+    i18n_domain = root.attrib.get(ns("domain", prefix=I18N_NAMESPACE))
+    parseContext().i18n_domain = i18n_domain
 
-    model = Model()
+    if isinstance(schemata, str):
+        schemata = (schemata,)
+
+    if lazy:
+        model = Model(LazySchemata())
+    else:
+        model = Model()
 
     handlers = {}
     schema_metadata_handlers = tuple(getUtilitiesFor(ISchemaMetadataHandler))
@@ -92,29 +485,8 @@ def _parse(source, policy):
 
     policy_util = getUtility(ISchemaPolicy, name=policy)
 
-    def readField(fieldElement, schemaAttributes, fieldElements, baseFields):
-        # Parse field attributes
-        fieldName = fieldElement.get("name")
-        fieldType = fieldElement.get("type")
-
-        if fieldName is None or fieldType is None:
-            raise ValueError(
-                "The attributes 'name' and 'type' are required for each "
-                "<field /> element"
-            )
-
-        handler = handlers.get(fieldType)
-        if handler is None:
-            handler = handlers[fieldType] = queryUtility(
-                IFieldExportImportHandler, name=fieldType
-            )
-            if handler is None:
-                raise ValueError(
-                    "Field type {} specified for field {} is not "
-                    "supported".format(fieldType, fieldName)
-                )
-
-        field = handler.read(fieldElement)
+    def readField(fieldElement, schemaAttributes, fieldElements, baseFields, share):
+        fieldName, field = _readField(fieldElement, handlers, share)
 
         # Preserve order from base interfaces if this field is an override
         # of a field with the same name in a base interface
@@ -128,83 +500,88 @@ def _parse(source, policy):
 
         return fieldName
 
-    for schema_element in root.findall(ns("schema")):
-        parseinfo.stack.append(schema_element)
+    def buildSchema(schema_element, schemaName):
+        context = parseContext()
+        if context.stack is not None:
+            return trackedBuildSchema(context, schema_element, schemaName)
+        try:
+            return trackedBuildSchema(context, schema_element, schemaName)
+        except Exception:
+            # Fast mode: read the elements again, tracking them, to find
+            # where the error happens. The schema is not built again, so
+            # schema plugins and metadata handlers do not run twice. Errors
+            # they raise are reported at the schema element, as when
+            # tracking.
+            context.element = schema_element
+            with parsing(context.i18n_domain) as diagnostic:
+                try:
+                    readElements(diagnostic, schema_element, schemaName, False)
+                except Exception:
+                    context.element = diagnostic.current()
+            raise
+
+    def readElements(context, schema_element, schemaName, share=True):
+        """Read the bases, fields, fieldsets and invariants of a schema,
+        pushing the schema element onto the stack of the context.
+        """
+        track = context.track
+        if context.stack is not None:
+            context.stack.append(schema_element)
         schemaAttributes = {}
 
-        schemaName = schema_element.get("name")
-        if schemaName is None:
-            schemaName = ""
-
         bases = ()
         baseFields = {}
         based_on = schema_element.get("based-on")
         if based_on is not None:
-            bases = tuple([resolve(dotted) for dotted in based_on.split()])
-            for base_schema in bases:
-                baseFields.update(getFields(base_schema))
+            bases = tuple([resolveDottedName(dotted) for dotted in based_on.split()])
+            baseFields = getBaseFields(bases)
 
         fieldElements = {}
 
-        # Read global fields
-        for fieldElement in schema_element.findall(ns("field")):
-            parseinfo.stack.append(fieldElement)
-            readField(fieldElement, schemaAttributes, fieldElements, baseFields)
-            parseinfo.stack.pop()
-
-        # Read invariants, fieldsets and their fields
+        # Read fields, invariants, fieldsets and their fields
         invariants = []
         fieldsets = []
         fieldsets_by_name = {}
 
-        for subelement in schema_element:
-            parseinfo.stack.append(subelement)
+        for subelement in track(schema_element):
 
             if subelement.tag == ns("field"):
-                readField(subelement, schemaAttributes, fieldElements, baseFields)
+                readField(
+                    subelement, schemaAttributes, fieldElements, baseFields, share
+                )
 
             elif subelement.tag == ns("fieldset"):
-                fieldset_name = subelement.get("name")
-                if fieldset_name is None:
-                    raise ValueError(f"Fieldset in schema {schemaName} has no name")
+                fieldset_name = _fieldsetName(subelement, schemaName)
 
                 fieldset = fieldsets_by_name.get(fieldset_name)
                 if fieldset is None:
-                    fieldset_label = subelement.get("label")
-                    fieldset_description = subelement.get("description")
-                    fieldset_order = subelement.get("order")
-                    if fieldset_order is None:
-                        fieldset_order = DEFAULT_ORDER
-                    elif isinstance(fieldset_order, str):
-                        fieldset_order = int(fieldset_order)
+                    fieldset_label = internString(subelement.get("label"))
+                    fieldset_description = internString(subelement.get("description"))
                     fieldset = fieldsets_by_name[fieldset_name] = Fieldset(
                         fieldset_name,
                         label=fieldset_label,
                         description=fieldset_description,
-                        order=fieldset_order,
+                        order=_fieldsetOrder(subelement),
                     )
                     fieldsets_by_name[fieldset_name] = fieldset
                     fieldsets.append(fieldset)
 
-                for fieldElement in subelement.findall(ns("field")):
-                    parseinfo.stack.append(fieldElement)
+                for fieldElement in track(subelement.findall(ns("field"))):
                     parsed_fieldName = readField(
-                        fieldElement, schemaAttributes, fieldElements, baseFields
+                        fieldElement, schemaAttributes, fieldElements, baseFields, share
                     )
                     if parsed_fieldName:
                         fieldset.fields.append(parsed_fieldName)
-                    parseinfo.stack.pop()
 
             elif subelement.tag == ns("invariant"):
-                dotted = subelement.text
-                invariant = resolve(dotted)
-                if not IInvariant.providedBy(invariant):
-                    raise ImportError(
-                        "Invariant functions must provide "
-                        "plone.supermodel.interfaces.IInvariant"
-                    )
-                invariants.append(invariant)
-            parseinfo.stack.pop()
+                invariants.append(_invariant(subelement))
+
+        return bases, schemaAttributes, fieldElements, fieldsets, invariants
+
+    def trackedBuildSchema(context, schema_element, schemaName):
+        bases, schemaAttributes, fieldElements, fieldsets, invariants = readElements(
+            context, schema_element, schemaName
+        )
 
         schema = SchemaClass(
             name=policy_util.name(schemaName, tree),
@@ -221,22 +598,219 @@ def _parse(source, policy):
         # Save fieldsets
         schema.setTaggedValue(FIELDSETS_KEY, fieldsets)
 
-        # Let metadata handlers write metadata
+        # Let metadata handlers write metadata. A handler with a namespace
+        # is only called for the fields and schemata using that namespace.
+        fieldNames = [fieldName for fieldName in schema if fieldName in fieldElements]
+        fieldNamesByNamespace = {}
+        for fieldName in fieldNames:
+            for namespace in elementNamespaces(fieldElements[fieldName]):
+                fieldNamesByNamespace.setdefault(namespace, []).append(fieldName)
+
         for handler_name, metadata_handler in field_metadata_handlers:
-            for fieldName in schema:
-                if fieldName in fieldElements:
-                    metadata_handler.read(
-                        fieldElements[fieldName], schema, schema[fieldName]
-                    )
+            namespace = getattr(metadata_handler, "namespace", None)
+            if namespace is not None:
+                names = fieldNamesByNamespace.get(namespace, ())
+            else:
+                names = fieldNames
+            for fieldName in names:
+                metadata_handler.read(
+                    fieldElements[fieldName], schema, schema[fieldName]
+                )
 
+        schemaNamespaces = None
         for handler_name, metadata_handler in schema_metadata_handlers:
+            namespace = getattr(metadata_handler, "namespace", None)
+            if namespace is not None:
+                if schemaNamespaces is None:
+                    schemaNamespaces = elementNamespaces(schema_element)
+                if namespace not in schemaNamespaces:
+                    continue
             metadata_handler.read(schema_element, schema)
 
-        model.schemata[schemaName] = schema
-        parseinfo.stack.pop()
+        if context.stack is not None:
+            context.stack.pop()
+        return schema
+
+    for schema_element in root.findall(ns("schema")):
+        schemaName = schema_element.get("name")
+        if schemaName is None:
+            schemaName = ""
+
+        # Only build the requested schemata, if any were given
+        if schemata is not None and schemaName not in schemata:
+            continue
+
+        if lazy:
+            model.schemata.defer(
+                schemaName,
+                _deferredSchema(
+                    buildSchema, schema_element, schemaName, fname, i18n_domain, fast
+                ),
+            )
+        else:
+            model.schemata[schemaName] = buildSchema(schema_element, schemaName)
+
+    return model
+
+
+def parseMany(
+    sources,
+    policy="",
+    workers=None,
+    chunksize=None,
+    initializer=None,
+    mp_context=None,
+    packages=(),
+):
+    """Parse many models in a pool of worker processes.
+
+    Each source is a filename, or a model as bytes or as a string starting
+    with "<". Return a list with one entry per source, in the same order:
+    either the parsed Model or the exception raised for that source, usually
+    a SupermodelParseError.
+
+    The workers are started with mp_context, by default the platform's
+    default start method. They need the component registrations of this
+    process: unless an initializer is given, a worker that did not inherit
+    them loads the ZCML of plone.supermodel and of the given packages.
+    """
+    sources = list(sources)
+    if not sources:
+        return []
+    if initializer is None:
+        initializer = functools.partial(_initWorker, tuple(packages))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(sources) // (workers * 4))
+
+    chunks = [sources[i : i + chunksize] for i in range(0, len(sources), chunksize)]
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=mp_context, initializer=initializer
+    ) as executor:
+        futures = [executor.submit(_parseChunk, chunk, policy) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            try:
+                compact_models = future.result()
+            except Exception as e:
+                results.extend([e] * len(chunk))
+                continue
+            for compact in compact_models:
+                if isinstance(compact, Exception):
+                    results.append(compact)
+                    continue
+                try:
+                    results.append(_expandModel(pickle.loads(compact)))
+                except Exception as e:
+                    results.append(e)
+    return results
+
+
+def parseConcurrently(sources, policy="", workers=None):
+    """Parse many models in a pool of threads of this process.
+
+    Takes the same sources as parseMany() and returns the same kind of list,
+    but the models are parsed in place, so no component registrations need
+    to be set up and the results need not be pickled. This pays off where the
+    threads can run in parallel, i.e. on a free-threaded Python build, or
+    when reading the sources waits on I/O.
+    """
+    sources = list(sources)
+    if not sources:
+        return []
+    if workers is None:
+        workers = min(len(sources), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_parseSource, source, policy) for source in sources]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _parseSource(source, policy):
+    if isinstance(source, str) and source.lstrip().startswith("<"):
+        source = source.encode()
+    return parse(source, policy)
+
+
+def _initWorker(packages):
+    # Forked workers inherit the registrations, spawned ones load them
+    if queryUtility(IFieldExportImportHandler, name="zope.schema.TextLine") is None:
+        configure(packages)
+
+
+def _parseChunk(sources, policy):
+    """Parse the sources in a worker process and return a list with the
+    pickled compact form of each model, or the exception for a source.
+    """
+    results = []
+    for source in sources:
+        try:
+            results.append(pickle.dumps(_compactModel(_parseSource(source, policy))))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _compactModel(model):
+    """Return a picklable form of the model: for each schema its name,
+    module, bases, fields (detached from the schema) and direct tagged
+    values.
+    """
+    compact = []
+    for schemaName, schema in model.schemata.items():
+        fields = []
+        for fieldName, field in sortedFields(schema):
+            clone = cloneField(field)
+            clone.interface = None
+            fields.append((fieldName, clone))
+        tagged_values = {
+            tag: Element.queryTaggedValue(schema, tag)
+            for tag in Element.getTaggedValueTags(schema)
+        }
+        compact.append(
+            (
+                schemaName,
+                schema.__name__,
+                schema.__module__,
+                schema.__bases__,
+                fields,
+                tagged_values,
+            )
+        )
+    return compact
+
 
-    parseinfo.i18n_domain = None
+def _expandModel(compact):
+    """Build a Model from the form returned by _compactModel()."""
+    model = Model()
+    for schemaName, name, module, bases, fields, tagged_values in compact:
+        # Field order comes from a per-process counter. Renumber the fields
+        # the way _parse() would have done in this process.
+        baseFields = getBaseFields(bases)
+        schemaAttributes = {}
+        for fieldName, field in fields:
+            base_field = baseFields.get(fieldName)
+            if base_field is not None:
+                field.order = base_field.order
+            else:
+                with _construct_lock:
+                    Field.order += 1
+                    field.order = Field.order
+            schemaAttributes[fieldName] = field
+
+        schema = SchemaClass(
+            name=name, bases=bases, __module__=module, attrs=schemaAttributes
+        )
+        for tag, value in tagged_values.items():
+            schema.setTaggedValue(tag, value)
+        model.schemata[schemaName] = schema
     return model
 
 
-__all__ = ("parse",)
+__all__ = ("aparse", "parse", "parseConcurrently", "parseMany", "validate")
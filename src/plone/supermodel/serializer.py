@@ -43,6 +43,48 @@ class DefaultFieldNameExtractor:
 
 
 def serialize(model):
+    return prettyXML(_serialize(model))
+
+
+def serializeElement(model, parent=None):
+    """Return the model as an lxml <model /> element, without serializing it
+    to a string.
+
+    Unlike the string returned by serialize(), the element and its
+    descendants are in the supermodel XML namespace, so it can be passed to
+    parser.parse(element=...) or embedded in another document as it is. If
+    parent is given, the element is appended to it.
+    """
+    xml = _serialize(model, namespaced=True)
+    for element in xml.iter(etree.Element):
+        if not element.tag.startswith("{"):
+            element.tag = ns(element.tag)
+    if parent is not None:
+        parent.append(xml)
+    return xml
+
+
+def _handlersFor(schema, handlers):
+    """Return the metadata handlers that may have something to write for the
+    schema: those without taggedValueKeys, and those with a key that is set
+    on the schema or one of its bases.
+    """
+    tags = None
+    selected = []
+    for name, handler in handlers:
+        keys = getattr(handler, "taggedValueKeys", None)
+        if keys is not None:
+            if tags is None:
+                tags = set()
+                for iface in schema.__iro__:
+                    tags.update(iface.getDirectTaggedValueTags())
+            if tags.isdisjoint(keys):
+                continue
+        selected.append((name, handler))
+    return selected
+
+
+def _serialize(model, namespaced=False):
     handlers = {}
     schema_metadata_handlers = tuple(getUtilitiesFor(ISchemaMetadataHandler))
     field_metadata_handlers = tuple(getUtilitiesFor(IFieldMetadataHandler))
@@ -53,8 +95,12 @@ def serialize(model):
         if namespace is not None and prefix is not None:
             nsmap[prefix] = namespace
 
-    xml = etree.Element("model", nsmap=nsmap)
-    xml.set("xmlns", XML_NAMESPACE)
+    if namespaced:
+        nsmap[None] = XML_NAMESPACE
+        xml = etree.Element(ns("model"), nsmap=nsmap)
+    else:
+        xml = etree.Element("model", nsmap=nsmap)
+        xml.set("xmlns", XML_NAMESPACE)
 
     def writeField(field, parentElement):
         name_extractor = IFieldNameExtractor(field)
@@ -72,12 +118,16 @@ def serialize(model):
         if fieldElement is not None:
             parentElement.append(fieldElement)
 
-            for handler_name, metadata_handler in field_metadata_handlers:
+            for handler_name, metadata_handler in field_handlers:
                 metadata_handler.write(fieldElement, schema, field)
 
     for schemaName, schema in model.schemata.items():
+        schema_handlers = _handlersFor(schema, schema_metadata_handlers)
+        field_handlers = _handlersFor(schema, field_metadata_handlers)
+
         fieldsets = schema.queryTaggedValue(FIELDSETS_KEY, [])
 
+        # Not fieldsetIndex(): it does not see fieldsets changed in place
         fieldset_fields = set()
         for fieldset in fieldsets:
             fieldset_fields.update(fieldset.fields)
@@ -117,14 +167,14 @@ def serialize(model):
 
             schema_element.append(fieldset_element)
 
-        for handler_name, metadata_handler in schema_metadata_handlers:
+        for handler_name, metadata_handler in schema_handlers:
             metadata_handler.write(schema_element, schema)
 
         xml.append(schema_element)
 
     # handle i18n
     i18n_domain = xml.get(ns("domain", prefix=I18N_NAMESPACE))
-    for node in xml.xpath("//*[@i18n:translate]", namespaces=nsmap):
+    for node in xml.xpath("//*[@i18n:translate]", namespaces={"i18n": I18N_NAMESPACE}):
         domain = node.get(ns("domain", prefix=I18N_NAMESPACE), i18n_domain)
         if i18n_domain is None:
             i18n_domain = domain
@@ -133,7 +183,7 @@ def serialize(model):
     if i18n_domain:
         xml.set(ns("domain", prefix=I18N_NAMESPACE), i18n_domain)
 
-    return prettyXML(xml)
+    return xml
 
 
-__all__ = ("serialize",)
+__all__ = ("serialize", "serializeElement")
@@ -1,12 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from io import StringIO
 from lxml import etree
+from plone.supermodel import _model_cache
+from plone.supermodel import _model_hashes
+from plone.supermodel import aloadFile
+from plone.supermodel import bundle
+from plone.supermodel import loadElement
+from plone.supermodel import loadFile
+from plone.supermodel import loadString
+from plone.supermodel import parser
+from plone.supermodel import preloadModels
+from plone.supermodel import reloadChangedModels
+from plone.supermodel import serializeModel
+from plone.supermodel import serializeModelElement
+from plone.supermodel import serializeSchema
 from plone.supermodel import utils
+from plone.supermodel.codegen import className
+from plone.supermodel.codegen import compileFile
+from plone.supermodel.codegen import generate
+from plone.supermodel.codegen import references
+from plone.supermodel.debug import _parse_context
+from plone.supermodel.debug import ParseContext
+from plone.supermodel.debug import parseContext
+from plone.supermodel.debug import parseinfo
+from plone.supermodel.debug import parsing
+from plone.supermodel.directives import load
 from plone.supermodel.exportimport import ChoiceHandler
+from plone.supermodel.exportimport import OrderedDictField
+from plone.supermodel.interfaces import FIELDSETS_KEY
+from plone.supermodel.interfaces import FILENAME_KEY
 from plone.supermodel.interfaces import IDefaultFactory
+from plone.supermodel.interfaces import IFieldExportImportHandler
+from plone.supermodel.interfaces import IFieldMetadataHandler
 from plone.supermodel.interfaces import IInvariant
+from plone.supermodel.interfaces import ISchema
+from plone.supermodel.interfaces import ISchemaMetadataHandler
+from plone.supermodel.interfaces import ISchemaPlugin
+from plone.supermodel.model import Fieldset
+from plone.supermodel.model import fieldsetIndex
+from plone.supermodel.model import finalizeSchemas
+from plone.supermodel.model import Schema
+from plone.supermodel.model import SchemaClass
+from plone.supermodel.model import sortedFieldsets
+from plone.supermodel.parser import aparse
+from plone.supermodel.parser import parse
+from plone.supermodel.parser import parseConcurrently
+from plone.supermodel.parser import parseMany
+from plone.supermodel.parser import SupermodelParseError
+from plone.supermodel.parser import validate
+from plone.supermodel.parser import xmlParser
+from unittest import mock
 from zope import schema
+from zope.i18nmessageid import Message
 from zope.interface import alsoProvides
+from zope.interface import directlyProvidedBy
+from zope.interface import directlyProvides
 from zope.interface import implementer
 from zope.interface import Interface
 from zope.interface import Invalid
@@ -17,8 +66,21 @@ from zope.schema.interfaces import IContextSourceBinder
 from zope.schema.vocabulary import SimpleTerm
 from zope.schema.vocabulary import SimpleVocabulary
 
+import asyncio
+import contextvars
 import doctest
+import gc
+import importlib.util
+import multiprocessing
+import os.path
+import pickle
 import re
+import shutil
+import sys
+import tempfile
+import threading
+import tracemalloc
+import types
 import unittest
 import zope.component.testing
 
@@ -129,6 +191,186 @@ class TestUtils(unittest.TestCase):
         self.assertEqual("first tag", IDest.getTaggedValue("tag1"))
         self.assertEqual("tag two", IDest.getTaggedValue("tag2"))
 
+    def test_resolveDottedName(self):
+        module = types.ModuleType("supermodel_tests_dynamic")
+        module.IOne = Interface
+        sys.modules[module.__name__] = module
+        self.addCleanup(sys.modules.pop, module.__name__)
+
+        dotted = "supermodel_tests_dynamic.IOne"
+        self.assertIs(Interface, utils.resolveDottedName(dotted))
+        self.assertIs(IBase, utils.resolveDottedName("plone.supermodel.tests.IBase"))
+
+        # Rebinding the name, e.g. by reloading the module, is noticed
+        module.IOne = IBase
+        self.assertIs(IBase, utils.resolveDottedName(dotted))
+
+        # So is replacing the module
+        other = types.ModuleType(module.__name__)
+        other.IOne = IDummy
+        sys.modules[module.__name__] = other
+        self.assertIs(IDummy, utils.resolveDottedName(dotted))
+
+        self.assertIs(
+            sys.modules["plone.supermodel"], utils.resolveDottedName("plone.supermodel")
+        )
+
+    def test_stringPool(self):
+        pool = utils.StringPool(maxsize=6)
+        first = "".join(["ti", "tle"])
+        self.assertIs(first, pool.string(first))
+        self.assertIs(first, pool.string("".join(["ti", "tle"])))
+        self.assertIs(None, pool.string(None))
+        message = pool.message("title_label", "plone", "Title")
+        self.assertEqual("Title", message.default)
+        self.assertIs(message, pool.message("title_label", "plone", "Title"))
+        self.assertIsNot(message, pool.message("title_label", "other", "Title"))
+        # title, the message and its strings, and the domain "other"
+        self.assertEqual(6, pool.stats()["size"])
+        self.assertEqual(4, pool.stats()["hits"])
+        self.assertGreater(pool.stats()["saved"], 0)
+
+        # The pool is full
+        extra = "".join(["ext", "ra"])
+        self.assertIs(extra, pool.string(extra))
+        self.assertIsNot(extra, pool.string("".join(["ext", "ra"])))
+        self.assertEqual(6, len(pool))
+        pool.clear()
+        self.assertEqual({"size": 0, "hits": 0, "saved": 0}, pool.stats())
+
+    def test_intern_strings(self):
+        configure()
+        self.addCleanup(zope.component.testing.tearDown)
+        self.addCleanup(setattr, utils, "INTERN_STRINGS", utils.INTERN_STRINGS)
+        self.addCleanup(utils.stringPool.clear)
+        utils.INTERN_STRINGS = True
+        utils.stringPool.clear()
+
+        source = b"""\
+<model xmlns="http://namespaces.plone.org/supermodel/schema"
+       xmlns:i18n="http://xml.zope.org/namespaces/i18n"
+       i18n:domain="plone.supermodel.tests">
+    <schema>
+        <field type="zope.schema.TextLine" name="title">
+            <title i18n:translate="title_label">Title</title>
+            <description>A description</description>
+        </field>
+    </schema>
+</model>
+"""
+        one = parse(BytesIO(source)).schema["title"]
+        two = parse(BytesIO(source)).schema["title"]
+        self.assertIsNot(one, two)
+        self.assertIs(one.title, two.title)
+        self.assertEqual("plone.supermodel.tests", two.title.domain)
+        self.assertIs(one.description, two.description)
+        self.assertIs(one.__name__, two.__name__)
+        self.assertGreaterEqual(utils.stringPool.stats()["hits"], 3)
+
+    def test_getBaseFields(self):
+        class IOther(Interface):
+            title = schema.Int(title="Other title")
+            other = schema.Int(title="Other")
+
+        fields = utils.getBaseFields((IBase, IOther))
+        self.assertEqual(["description", "name", "other", "title"], sorted(fields))
+        self.assertIs(IOther["title"], fields["title"])
+        fields["extra"] = None
+        self.assertNotIn("extra", utils.getBaseFields((IBase, IOther)))
+
+        # syncSchema() invalidates the remembered fields
+        class ISource(Interface):
+            added = schema.Int(title="Added")
+
+        utils.syncSchema(ISource, IOther)
+        self.assertIn("added", utils.getBaseFields((IOther,)))
+
+        # So do new bases
+        IOther.__bases__ = (IDummy,)
+        self.assertEqual(
+            ["added", "other", "title"], sorted(utils.getBaseFields((IOther,)))
+        )
+        IOther.__bases__ = (IBase,)
+        self.assertEqual(
+            ["added", "description", "name", "other", "title"],
+            sorted(utils.getBaseFields((IOther,))),
+        )
+
+    def test_syncSchema_clones(self):
+        class IMarker(Interface):
+            pass
+
+        class IOther(Interface):
+            pass
+
+        class ISource(Interface):
+            one = schema.TextLine(title="A")
+            two = schema.Int(title="B")
+
+        class IDest(Interface):
+            pass
+
+        alsoProvides(ISource["one"], IMarker)
+        ISource["one"].setTaggedValue("tag", "value")
+
+        utils.syncSchema(ISource, IDest)
+        one = IDest["one"]
+        self.assertIsNot(ISource["one"], one)
+        self.assertIs(IDest, one.interface)
+        self.assertIs(ISource, ISource["one"].interface)
+        self.assertTrue(IMarker.providedBy(one))
+        self.assertFalse(IMarker.providedBy(IDest["two"]))
+        self.assertEqual("value", one.getTaggedValue("tag"))
+
+        # Changes to the clone do not reach the source field
+        alsoProvides(one, IOther)
+        one.setTaggedValue("tag", "changed")
+        one.title = "C"
+        self.assertFalse(IOther.providedBy(ISource["one"]))
+        self.assertEqual("value", ISource["one"].getTaggedValue("tag"))
+        self.assertEqual("A", ISource["one"].title)
+
+    def test_syncSchema_clone_memory(self):
+        class IMarker(Interface):
+            pass
+
+        def copyField(field):
+            # How fields were copied before cloneField()
+            clone = field.__class__.__new__(field.__class__)
+            clone.__dict__.update(field.__dict__)
+            directlyProvides(clone, *directlyProvidedBy(field))
+            return clone
+
+        configure()
+        self.addCleanup(zope.component.testing.tearDown)
+        fields = "".join(
+            f'<field type="zope.schema.TextLine" name="field{i}" />' for i in range(20)
+        )
+        sources = []
+        for i in range(50):
+            source = loadString(
+                '<model xmlns="http://namespaces.plone.org/supermodel/schema">'
+                f"<schema>{fields}</schema></model>"
+            ).schema
+            for name in list(source)[:5]:
+                alsoProvides(source[name], IMarker)
+            sources.append(source)
+
+        def retained(clone):
+            dests = [SchemaClass(f"IDest{i}", (Schema,)) for i in range(50)]
+            gc.collect()
+            tracemalloc.start()
+            try:
+                with mock.patch.object(utils, "cloneField", clone):
+                    for source, dest in zip(sources, dests):
+                        utils.syncSchema(source, dest)
+                return tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+
+        # The copies share the declarations of their marker interfaces
+        self.assertLess(retained(utils.cloneField), retained(copyField) * 0.75)
+
     def test_syncSchema_overwrite(self):
         class ISource(Interface):
             one = schema.TextLine(title="A")
@@ -549,6 +791,44 @@ class TestChoiceHandling(unittest.TestCase):
             el = self.handler.write(field, "myfield", "zope.schema.Choice")
             self.assertEqual(etree.tostring(el), expected)
 
+    def test_choice_values_bulk_write(self):
+        """writeValues() produces the same output as valueToElement()"""
+
+        values = [f"value{i:05d}" for i in range(2000)]
+        vocab = SimpleVocabulary([SimpleTerm(v, title=v) for v in values])
+        expected = utils.valueToElement(
+            self.handler.fieldAttributes["values"], values, "values", force=True
+        )
+        self.assertEqual(
+            etree.tostring(self.handler.writeValues(vocab)),
+            etree.tostring(expected),
+        )
+
+        titles = {
+            v: (
+                Message("msg_" + v, domain="plone", default=v.upper())
+                if i % 2
+                else v.upper()
+            )
+            for i, v in enumerate(values)
+        }
+        vocab = SimpleVocabulary(
+            [SimpleTerm(v, title=titles[v]) for v in reversed(values)]
+        )
+        expected = utils.valueToElement(
+            OrderedDictField(
+                key_type=schema.TextLine(),
+                value_type=schema.TextLine(),
+            ),
+            titles,
+            "values",
+            force=True,
+        )
+        self.assertEqual(
+            etree.tostring(self.handler.writeValues(vocab)),
+            etree.tostring(expected),
+        )
+
     def test_choice_parsing(self):
         def _termvalues(vocab):
             return tuple((t.value, t.title) for t in vocab)
@@ -568,6 +848,857 @@ class TestChoiceHandling(unittest.TestCase):
             )
 
 
+class TestFieldsets(unittest.TestCase):
+    def test_fieldset_index(self):
+        class ISchema(Schema):
+            one = schema.TextLine()
+            two = schema.TextLine()
+
+        self.assertEqual((), sortedFieldsets(ISchema))
+        self.assertEqual({}, dict(fieldsetIndex(ISchema)))
+
+        last = Fieldset("last", fields=["one"])
+        first = Fieldset("first", fields=["two"], order=1)
+        ISchema.setTaggedValue(FIELDSETS_KEY, [last, first])
+        self.assertEqual((first, last), sortedFieldsets(ISchema))
+        self.assertIs(sortedFieldsets(ISchema), sortedFieldsets(ISchema))
+        self.assertIs(last, fieldsetIndex(ISchema)["one"])
+        with self.assertRaises(TypeError):
+            fieldsetIndex(ISchema)["two"] = last
+
+        # Setting the tagged value again invalidates the index
+        last.fields.append("two")
+        self.assertIs(first, fieldsetIndex(ISchema)["two"])
+        first.fields.remove("two")
+        ISchema.setTaggedValue(FIELDSETS_KEY, ISchema.getTaggedValue(FIELDSETS_KEY))
+        self.assertIs(last, fieldsetIndex(ISchema)["two"])
+
+        # Inherited fieldsets are used, like in the serializer
+        class IDerived(ISchema):
+            pass
+
+        self.assertEqual((first, last), sortedFieldsets(IDerived))
+
+        # Extra attributes are kept, also when pickling
+        first.layout = "concise"
+        copy = pickle.loads(pickle.dumps(first))
+        self.assertEqual(
+            ("first", [], 1, "concise"),
+            (copy.__name__, copy.fields, copy.order, copy.layout),
+        )
+        self.assertFalse(hasattr(last, "__dict__") and vars(last))
+
+        # Fieldsets pickled with a dict state, before __slots__ was used
+        old = Fieldset.__new__(Fieldset)
+        old.__setstate__(
+            {
+                "__name__": "old",
+                "label": "Old",
+                "description": None,
+                "order": 2,
+                "fields": ["one"],
+            }
+        )
+        self.assertEqual("<Fieldset 'old' order 2 of one>", repr(old))
+        self.assertEqual("Old", old.label)
+
+    def test_serialize_changed_fieldsets(self):
+        configure()
+        self.addCleanup(zope.component.testing.tearDown)
+
+        class ISchema(Schema):
+            a = schema.TextLine()
+            b = schema.TextLine()
+
+        ISchema.setTaggedValue(FIELDSETS_KEY, [Fieldset("extra", fields=["a", "b"])])
+        fieldsetIndex(ISchema)
+        serializeSchema(ISchema)
+        ISchema.getTaggedValue(FIELDSETS_KEY)[0].fields.remove("b")
+        self.assertIn('name="b"', serializeSchema(ISchema))
+
+
+class ParseTestCase(unittest.TestCase):
+    """Base class of the parser tests, with the component registrations of
+    plone.supermodel and some models.
+    """
+
+    def setUp(self):
+        configure()
+
+    def tearDown(self):
+        zope.component.testing.tearDown()
+
+    model = b"""\
+<model xmlns="http://namespaces.plone.org/supermodel/schema">
+    <schema>
+        <field type="zope.schema.TextLine" name="title" />
+    </schema>
+    <schema name="broken">
+        <field type="aint_gonna_exist" name="title" />
+    </schema>
+</model>
+"""
+
+    def _sources(self, count):
+        return [f"""\
+<model xmlns="http://namespaces.plone.org/supermodel/schema"
+       xmlns:i18n="http://xml.zope.org/namespaces/i18n"
+       i18n:domain="plone">
+    <schema based-on="plone.supermodel.tests.IBase">
+        <field type="zope.schema.TextLine" name="name">
+            <title i18n:translate="">Name</title>
+        </field>
+        <field type="zope.schema.Int" name="number{i}">
+            <default>{i}</default>
+        </field>
+        <fieldset name="extra" label="Extra">
+            <field type="zope.schema.Choice" name="choice">
+                <values><element>a</element><element>b</element></values>
+            </field>
+        </fieldset>
+    </schema>
+</model>
+""" for i in range(count)]
+
+    def _tempDir(self):
+        """Return a temporary directory that is removed after the test."""
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        return tmpdir
+
+    def _uncache(self, *paths):
+        """Forget the models loaded from the files after the test."""
+        # Also collect their schemata, which would otherwise be finalized by
+        # later tests, loading the removed files again
+        self.addCleanup(gc.collect)
+        for path in paths:
+            self.addCleanup(_model_cache.pop, path, None)
+            self.addCleanup(_model_hashes.pop, path, None)
+
+
+class TestLazySchemata(ParseTestCase):
+    def test_lazy_schemata(self):
+        model = parse(BytesIO(self.model), lazy=True)
+        self.assertEqual(["", "broken"], list(model.schemata))
+        self.assertEqual(["", "broken"], model.schemata.pending())
+        self.assertEqual(["title"], getFieldNamesInOrder(model.schema))
+        self.assertEqual(["broken"], model.schemata.pending())
+
+        with self.assertRaises(SupermodelParseError) as cm:
+            model.schemata["broken"]
+        self.assertIn("aint_gonna_exist", str(cm.exception))
+        self.assertIn("line 6", str(cm.exception))
+        self.assertEqual(["broken"], model.schemata.pending())
+
+    def test_selected_schemata(self):
+        # The broken schema is never built
+        model = loadString(self.model, schemata=("",))
+        self.assertEqual([""], list(model.schemata))
+        self.assertEqual(["title"], getFieldNamesInOrder(model.schema))
+
+        model = loadString(self.model, schemata="missing")
+        self.assertEqual([], list(model.schemata))
+
+    def test_eager_schemata(self):
+        with self.assertRaises(SupermodelParseError):
+            parse(BytesIO(self.model))
+
+
+class TestLoadElement(ParseTestCase):
+    def test_load_element(self):
+        document = etree.fromstring(
+            b"<object><property>x</property>" + self.model + b"</object>"
+        )
+        element = document[1]
+        model = loadElement(element, schemata=[""])
+        self.assertEqual(["title"], getFieldNamesInOrder(model.schema))
+        # The element is left in place
+        self.assertIs(document, element.getparent())
+
+    def test_serialize_element(self):
+        model = loadString(self.model, schemata=[""])
+        parent = etree.Element("object")
+        element = serializeModelElement(model, parent=parent)
+        self.assertIs(parent, element.getparent())
+        self.assertEqual(
+            "{http://namespaces.plone.org/supermodel/schema}model", element.tag
+        )
+
+        reloaded = loadElement(element)
+        self.assertEqual(["title"], getFieldNamesInOrder(reloaded.schema))
+        self.assertEqual(serializeModel(model), serializeModel(reloaded))
+
+
+class TestLoadFile(ParseTestCase):
+    def test_preload_models(self):
+        tmpdir = self._tempDir()
+        paths = []
+        for i in range(5):
+            paths.append(os.path.join(tmpdir, f"model{i}.xml"))
+            with open(paths[-1], "wb") as fd:
+                fd.write(self.model)
+        broken = os.path.join(tmpdir, "broken.xml")
+        with open(broken, "wb") as fd:
+            fd.write(b"<model>")
+        self._uncache(broken, *paths)
+
+        self.assertEqual(paths, preloadModels(paths + [broken], workers=3))
+        self.assertNotIn(broken, _model_cache)
+
+        model = loadFile(paths[0], lazy=True)
+        self.assertIs(_model_cache[paths[0]], model)
+        self.assertEqual(["", "broken"], model.schemata.pending())
+        self.assertEqual(paths[0], model.schema.getTaggedValue(FILENAME_KEY))
+
+        # Already cached files are skipped
+        self.assertEqual([], preloadModels(paths))
+
+    def test_concurrent_load_file(self):
+        tmpdir = self._tempDir()
+        path = os.path.join(tmpdir, "model.xml")
+        with open(path, "w") as fd:
+            fd.write(self._sources(1)[0])
+        self._uncache(path)
+
+        barrier = threading.Barrier(8)
+
+        def load(lazy):
+            barrier.wait()
+            model = loadFile(path, lazy=lazy)
+            return model, model.schema
+
+        # The file is parsed and each schema built only once
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(load, [True, False] * 4))
+        self.assertEqual(1, len({id(model) for model, schema in results}))
+        self.assertEqual(1, len({id(schema) for model, schema in results}))
+        self.assertIs(_model_cache[path], results[0][0])
+
+    def test_shared_base_fields(self):
+        tmpdir = self._tempDir()
+        paths = []
+        for i in range(5):
+            paths.append(os.path.join(tmpdir, f"model{i}.xml"))
+            with open(paths[-1], "w") as fd:
+                fd.write(self._sources(1)[0])
+        self._uncache(*paths)
+
+        class IParent(Schema):
+            pass
+
+        # The fields of the shared base are looked up once, although each
+        # schema is synced with its model when it is created and finalized
+        utils._base_fields.pop(id(IBase), None)
+        loaded = []
+        with mock.patch.object(utils, "getFields", wraps=utils.getFields) as spy:
+            for path in paths:
+
+                class ILoaded(IParent):
+                    load(path)
+
+                loaded.append(ILoaded)
+            finalizeSchemas(IParent)
+        self.assertEqual(
+            1, len([call for call in spy.call_args_list if call.args == (IBase,)])
+        )
+        for iface in loaded:
+            self.assertEqual(["name", "number0", "choice"], getFieldNamesInOrder(iface))
+
+    def test_aload_file(self):
+        tmpdir = self._tempDir()
+        path = os.path.join(tmpdir, "model.xml")
+        with open(path, "w") as fd:
+            fd.write(self._sources(1)[0])
+        self._uncache(path)
+
+        model = asyncio.run(aloadFile(path))
+        self.assertIs(loadFile(path), model)
+        self.assertIs(model, asyncio.run(aloadFile(path, lazy=True)))
+        self.assertEqual(
+            ["title", "description", "name", "number0", "choice"],
+            getFieldNamesInOrder(model.schema),
+        )
+
+    def test_reload_changed_models(self):
+        tmpdir = self._tempDir()
+        path = os.path.join(tmpdir, "model.xml")
+        with open(path, "wb") as fd:
+            fd.write(self.model)
+        self._uncache(path)
+
+        model = loadFile(path, lazy=True)
+        with utils.mappedFile(path) as buffer:
+            self.assertEqual(utils.contentHash(self.model), _model_hashes[path])
+            self.assertEqual(utils.contentHash(buffer), _model_hashes[path])
+        self.assertEqual([], reloadChangedModels([path]))
+        self.assertIs(model, loadFile(path, lazy=True))
+
+        with open(path, "wb") as fd:
+            fd.write(self.model.replace(b'name="title"', b'name="changed"', 1))
+        self.assertEqual([path], reloadChangedModels([path]))
+        reloaded = loadFile(path, lazy=True)
+        self.assertIsNot(model, reloaded)
+        self.assertEqual(["changed"], getFieldNamesInOrder(reloaded.schema))
+        self.assertEqual(["broken"], reloaded.schemata.pending())
+        self.assertEqual([], reloadChangedModels([path]))
+
+        # Empty files cannot be mapped, and are read instead
+        empty = os.path.join(tmpdir, "empty.xml")
+        open(empty, "wb").close()
+        with utils.mappedFile(empty) as buffer:
+            self.assertEqual(b"", buffer)
+        # Errors while using the buffer are not chained to the mmap error
+        with self.assertRaises(KeyError) as raised:
+            with utils.mappedFile(empty):
+                raise KeyError("empty")
+        self.assertIsNone(raised.exception.__context__)
+
+        # Missing files are reported like broken ones
+        missing = os.path.join(tmpdir, "missing.xml")
+        with self.assertRaises(SupermodelParseError) as raised:
+            loadFile(missing)
+        self.assertIsInstance(raised.exception.orig_exc, FileNotFoundError)
+        self.assertEqual(missing, raised.exception.fname)
+
+
+class TestConcurrentParsing(ParseTestCase):
+    def test_parse_many(self):
+        sources = self._sources(20)
+        sources[5] = self.model
+
+        results = parseMany(sources, workers=2, chunksize=3)
+        self.assertEqual(len(sources), len(results))
+        self.assertIsInstance(results[5], SupermodelParseError)
+        self.assertIn("aint_gonna_exist", str(results[5]))
+        for i, (source, result) in enumerate(zip(sources, results)):
+            if source is self.model:
+                continue
+            self.assertEqual(serializeModel(loadString(source)), serializeModel(result))
+            # Overridden base fields keep their order
+            self.assertEqual(
+                ["title", "description", "name", f"number{i}", "choice"],
+                getFieldNamesInOrder(result.schema),
+            )
+
+        # Spawned workers load the registrations themselves
+        results = parseMany(
+            sources[4:6], workers=1, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.assertIsInstance(results[0].schema["choice"], schema.Choice)
+        self.assertIsInstance(results[1], SupermodelParseError)
+
+    def test_parse_concurrently(self):
+        sources = self._sources(100)
+        sources[5] = self.model
+        expected = [
+            None if source is self.model else serializeModel(loadString(source))
+            for source in sources
+        ]
+
+        results = parseConcurrently(sources, workers=8)
+        self.assertEqual(len(sources), len(results))
+        self.assertIsInstance(results[5], SupermodelParseError)
+        self.assertIn("line 6", str(results[5]))
+        for i, result in enumerate(results):
+            if i == 5:
+                continue
+            self.assertEqual(expected[i], serializeModel(result))
+            self.assertEqual(
+                ["title", "description", "name", f"number{i}", "choice"],
+                getFieldNamesInOrder(result.schema),
+            )
+
+    def test_aparse(self):
+        def source(i):
+            return BytesIO(
+                self._sources(1)[0].replace('"plone"', f'"domain{i}"').encode()
+            )
+
+        async def main():
+            return await asyncio.gather(
+                *[aparse(source(i)) for i in range(10)],
+                aparse(BytesIO(self.model)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(main())
+        for i, result in enumerate(results[:-1]):
+            self.assertEqual(f"domain{i}", result.schema["name"].title.domain)
+        self.assertIsInstance(results[-1], SupermodelParseError)
+        self.assertIn("line 6", str(results[-1]))
+
+        # No state is left behind in the current context
+        self.assertEqual([None], parseContext().stack)
+        self.assertIsNone(parseContext().i18n_domain)
+
+
+class TestParseContext(ParseTestCase):
+    def test_parseinfo(self):
+        handler = zope.component.getUtility(
+            IFieldExportImportHandler, name="zope.schema.Int"
+        )
+
+        def check():
+            # Outside of a parse, nothing is kept
+            stack = parseinfo.stack
+            stack.append("element")
+            self.assertIsNone(parseinfo.stack[-1])
+            self.assertIsNone(stack.pop())
+            self.assertEqual([], list(stack))
+            parseinfo.i18n_domain = "domain"
+            self.assertIsNone(parseinfo.i18n_domain)
+            for i in range(3):
+                with self.assertRaises(ValueError):
+                    handler.read(
+                        etree.fromstring("<field><default>x</default></field>")
+                    )
+            self.assertEqual([], list(parseinfo.stack))
+            self.assertIsNone(_parse_context.get(None))
+
+            # Neither is in a parse that does not track elements
+            with parsing(track=False):
+                untracked = parseinfo.stack
+                untracked.append("element")
+                self.assertIsNone(untracked[-1])
+                self.assertEqual([], list(untracked))
+
+            with parsing("domain"):
+                self.assertEqual([None], parseinfo.stack)
+                self.assertEqual("domain", parseinfo.i18n_domain)
+                parseinfo.i18n_domain = "other"
+                self.assertEqual("other", parseContext().i18n_domain)
+            self.assertIsNone(_parse_context.get(None))
+
+        # In a context of its own, so that nothing can leak into this one
+        contextvars.copy_context().run(check)
+
+    def test_fast_parse(self):
+        model = parse(BytesIO(self.model), fast=True, schemata=[""])
+        self.assertEqual(["title"], getFieldNamesInOrder(model.schema))
+
+        # The failing schema is built again to find the line of the error
+        for lazy in (False, True):
+            model = None
+            with self.assertRaises(SupermodelParseError) as cm:
+                model = parse(BytesIO(self.model), fast=True, lazy=lazy)
+                model.schemata["broken"]
+            self.assertIn("aint_gonna_exist", str(cm.exception))
+            self.assertIn("line 6", str(cm.exception))
+
+        # Errors of metadata handlers are found without building the schema
+        # again, so plugins and handlers only run once
+        calls = []
+
+        @implementer(ISchemaPlugin)
+        class Plugin:
+            def __init__(self, schema):
+                self.schema = schema
+
+            def __call__(self):
+                calls.append("plugin")
+
+        @implementer(IFieldMetadataHandler)
+        class Handler:
+            namespace = None
+
+            def read(self, node, schema, field):
+                calls.append("handler")
+                raise ValueError("Broken handler")
+
+        zope.component.provideAdapter(Plugin, (ISchema,), ISchemaPlugin, "count")
+        zope.component.provideUtility(Handler(), IFieldMetadataHandler, "broken")
+        for fast in (True, False):
+            del calls[:]
+            with self.assertRaises(SupermodelParseError) as cm:
+                parse(BytesIO(self.model), fast=fast, schemata=[""])
+            self.assertEqual(["plugin", "handler"], calls)
+            self.assertIn("Broken handler", str(cm.exception))
+            self.assertEqual(2, cm.exception.lineno)
+
+    def test_parse_context_released(self):
+        with self.assertRaises(SupermodelParseError) as cm:
+            parse(BytesIO(self.model))
+
+        # No context reachable from the traceback keeps elements alive
+        contexts = []
+        tb = cm.exception.__context__.__traceback__
+        while tb is not None:
+            contexts.extend(
+                value
+                for value in tb.tb_frame.f_locals.values()
+                if isinstance(value, ParseContext)
+            )
+            tb = tb.tb_next
+        self.assertTrue(contexts)
+        self.assertEqual([None] * len(contexts), [c.stack for c in contexts])
+
+        # Reading fields outside of a parse does not keep anything either
+        handler = zope.component.getUtility(
+            IFieldExportImportHandler, name="zope.schema.Int"
+        )
+        with self.assertRaises(ValueError):
+            handler.read(etree.fromstring("<field><default>x</default></field>"))
+        self.assertEqual([None], parseContext().stack)
+
+    def test_parse_error_data(self):
+        with mock.patch("traceback.format_tb") as format_tb:
+            with self.assertRaises(SupermodelParseError) as cm:
+                parse(BytesIO(self.model))
+            error = cm.exception
+            self.assertIsInstance(error.orig_exc, ValueError)
+            self.assertIsNone(error.fname)
+            self.assertEqual(6, error.lineno)
+            self.assertEqual(
+                "{http://namespaces.plone.org/supermodel/schema}field", error.tag
+            )
+            # The message is only rendered on demand
+            self.assertFalse(format_tb.called)
+            format_tb.return_value = []
+            self.assertIn('File "<unknown>", line 6', str(error))
+            self.assertEqual((str(error),), error.args)
+            self.assertEqual(1, format_tb.call_count)
+
+        unpickled = pickle.loads(pickle.dumps(error))
+        self.assertEqual(str(error), str(unpickled))
+        self.assertEqual(
+            (None, 6, error.tag), (unpickled.fname, unpickled.lineno, unpickled.tag)
+        )
+
+
+class TestParseSources(ParseTestCase):
+    def test_parse_bytes(self):
+        for source in (self.model, bytearray(self.model), memoryview(self.model)):
+            model = parse(source, schemata=[""])
+            self.assertEqual(["title"], getFieldNamesInOrder(model.schema))
+
+        with self.assertRaises(SupermodelParseError) as cm:
+            parse(memoryview(self.model))
+        self.assertEqual(6, cm.exception.lineno)
+
+    def test_xml_parser(self):
+        xml_parser = xmlParser()
+        self.assertIs(xml_parser, xmlParser())
+        self.assertIsNot(xml_parser, xmlParser(huge_tree=True))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertIsNot(xml_parser, executor.submit(xmlParser).result())
+
+
+class TestValidate(ParseTestCase):
+    def test_validate(self):
+        model = b"""\
+<model xmlns="http://namespaces.plone.org/supermodel/schema">
+    <schema based-on="plone.supermodel.tests.IMissing">
+        <field type="zope.schema.TextLine" />
+        <field type="zope.schema.Int" name="number">
+            <default>x</default>
+        </field>
+        <fieldset label="No name" order="abc">
+            <field type="aint_gonna_exist" name="other" />
+        </fieldset>
+        <invariant>plone.supermodel.tests.IBase</invariant>
+    </schema>
+    <schema name="valid">
+        <field type="zope.schema.TextLine" name="title" />
+    </schema>
+</model>
+"""
+        with mock.patch("plone.supermodel.parser.SchemaClass") as SchemaClass:
+            errors = validate(BytesIO(model))
+            self.assertEqual([], validate(BytesIO(self._sources(1)[0].encode())))
+        self.assertFalse(SchemaClass.called)
+
+        self.assertEqual(
+            [2, 3, 5, 7, 7, 8, 10], [error.lineno for error in errors], errors
+        )
+        expected = [ImportError, ValueError, ValueError, ValueError]
+        expected += [ValueError, ValueError, ImportError]
+        for error, exc_class in zip(errors, expected):
+            self.assertIsInstance(error.orig_exc, exc_class)
+        self.assertIn("abc", str(errors[4]))
+        self.assertIn("aint_gonna_exist", str(errors[5]))
+
+        # Validating does not fill the pool of shared fields
+        self.addCleanup(setattr, parser, "SHARE_FIELDS", parser.SHARE_FIELDS)
+        parser.SHARE_FIELDS = True
+        parser.fieldPool.clear()
+        self.assertEqual([], validate(BytesIO(self._sources(1)[0].encode())))
+        self.assertEqual(0, parser.fieldPool.stats()["size"])
+
+        errors = validate(BytesIO(b"<model>"))
+        self.assertEqual(1, len(errors))
+        self.assertIsInstance(errors[0].orig_exc, etree.XMLSyntaxError)
+
+
+class TestMetadataHandlers(ParseTestCase):
+    def test_metadata_handler_dispatch(self):
+        calls = []
+
+        @implementer(IFieldMetadataHandler, ISchemaMetadataHandler)
+        class Handler:
+            prefix = None
+
+            def __init__(self, name, namespace=None, taggedValueKeys=None):
+                self.name = name
+                self.namespace = namespace
+                if taggedValueKeys is not None:
+                    self.taggedValueKeys = taggedValueKeys
+
+            def read(self, node, schema, field=None):
+                calls.append((self.name, field and field.__name__))
+
+            def write(self, node, schema, field=None):
+                calls.append((self.name, field and field.__name__))
+
+        for handler in (
+            Handler("all"),
+            Handler("ui", "http://namespaces.acme.com/ui"),
+            Handler("other", "http://namespaces.acme.com/other", ("other",)),
+        ):
+            zope.component.provideUtility(
+                handler, IFieldMetadataHandler, name=handler.name
+            )
+            zope.component.provideUtility(
+                handler, ISchemaMetadataHandler, name=handler.name
+            )
+
+        model = loadString("""\
+<model xmlns="http://namespaces.plone.org/supermodel/schema"
+       xmlns:ui="http://namespaces.acme.com/ui">
+    <schema>
+        <field type="zope.schema.TextLine" name="one" />
+        <field type="zope.schema.TextLine" name="two" ui:widget="large" />
+        <fieldset name="extra">
+            <field type="zope.schema.TextLine" name="three">
+                <ui:widget>small</ui:widget>
+            </field>
+        </fieldset>
+    </schema>
+</model>
+""")
+        self.assertEqual(
+            [
+                ("all", "one"),
+                ("all", "three"),
+                ("all", "two"),
+                ("ui", "three"),
+                ("ui", "two"),
+                ("all", None),
+                ("ui", None),
+            ],
+            sorted(calls[:5]) + calls[5:],
+        )
+
+        # When writing, handlers with taggedValueKeys are skipped for
+        # schemata without any of them
+        del calls[:]
+        serializeModel(model)
+        self.assertNotIn("other", [name for name, field in calls])
+        model.schema.setTaggedValue("other", True)
+        del calls[:]
+        serializeModel(model)
+        self.assertIn(("other", None), calls)
+        self.assertIn(("other", "three"), calls)
+
+
+class TestModelBundle(ParseTestCase):
+    def test_model_bundle(self):
+        tmpdir = self._tempDir()
+        package = os.path.join(tmpdir, "supermodel_bundle_tests")
+        os.makedirs(os.path.join(package, "models"))
+        open(os.path.join(package, "__init__.py"), "w").close()
+        path = os.path.join(package, "models", "model.xml")
+        with open(path, "wb") as fd:
+            fd.write(self.model.replace(b'"aint_gonna_exist"', b'"zope.schema.Int"'))
+        with open(os.path.join(package, "models", "other.xml"), "wb") as fd:
+            fd.write(b"<other />")
+        sys.path.insert(0, tmpdir)
+        self.addCleanup(sys.path.remove, tmpdir)
+        self.addCleanup(sys.modules.pop, "supermodel_bundle_tests", None)
+        self.addCleanup(bundle.clearBundles)
+        self._uncache(path)
+
+        filename = os.path.join(tmpdir, "models.zip")
+        self.assertEqual(
+            ["supermodel_bundle_tests/models/model.xml"],
+            bundle.build(filename, ["supermodel_bundle_tests"]),
+        )
+        compiled = os.path.join(tmpdir, "compiled.zip")
+        bundle.build(compiled, ["supermodel_bundle_tests"], compile=True)
+
+        # Bundled models are found without the files
+        os.remove(path)
+        self.assertIsNone(bundle.lookup(path))
+        self.assertEqual(1, bundle.registerBundle(filename))
+        model = loadFile(path)
+        self.assertEqual(["title"], getFieldNamesInOrder(model.schema))
+        self.assertEqual(["title"], getFieldNamesInOrder(model.schemata["broken"]))
+
+        self.assertEqual(1, bundle.registerBundle(compiled))
+        self.assertIsNotNone(bundle.lookup(path)[1])
+        model = loadFile(path, reload=True)
+        self.assertEqual(["title"], getFieldNamesInOrder(model.schema))
+        self.assertIsInstance(model.schemata["broken"]["title"], schema.Int)
+
+        bundle.clearBundles()
+        self.assertIsNone(bundle.lookup(path))
+
+
+class TestCodegen(ParseTestCase):
+    def test_generate_module(self):
+        source = b"""\
+<model xmlns="http://namespaces.plone.org/supermodel/schema"
+       xmlns:i18n="http://xml.zope.org/namespaces/i18n"
+       i18n:domain="plone.supermodel.tests">
+    <schema based-on="plone.supermodel.tests.IBase">
+        <invariant>plone.supermodel.tests.dummy_invariant</invariant>
+        <field type="zope.schema.Int" name="x" />
+        <field type="zope.schema.TextLine" name="title">
+            <title i18n:translate="title_label">Title</title>
+            <defaultFactory>plone.supermodel.tests.dummy_defaultFactory</defaultFactory>
+        </field>
+        <field type="zope.schema.List" name="tags">
+            <required>False</required>
+            <value_type type="zope.schema.TextLine">
+                <max_length>10</max_length>
+            </value_type>
+            <default><element>a</element></default>
+        </field>
+        <field type="zope.schema.Choice" name="choice">
+            <values><element>a</element><element>b</element></values>
+        </field>
+        <fieldset name="extra" label="Extra" description="More fields">
+            <field type="zope.schema.Choice" name="titled">
+                <values>
+                    <element key="a">A</element>
+                    <element key="b">B</element>
+                </values>
+            </field>
+            <field type="zope.schema.Decimal" name="price">
+                <min>0.5</min>
+            </field>
+        </fieldset>
+    </schema>
+    <schema name="edit-form">
+        <field type="zope.schema.Choice" name="named">
+            <vocabulary>plone.supermodel.tests.vocabulary</vocabulary>
+        </field>
+        <field type="zope.schema.Date" name="date">
+            <default>2001-02-03</default>
+        </field>
+    </schema>
+</model>
+"""
+        self.assertEqual("ISchema", className(""))
+        self.assertEqual("IEditForm", className("edit-form"))
+
+        tmpdir = self._tempDir()
+        path = os.path.join(tmpdir, "model.xml")
+        with open(path, "wb") as fd:
+            fd.write(source)
+        output = compileFile(path)
+        self.assertEqual(os.path.join(tmpdir, "model.py"), output)
+
+        spec = importlib.util.spec_from_file_location("supermodel_generated", output)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        model = parse(BytesIO(source))
+        self.assertEqual(["", "edit-form"], list(module.MODEL.schemata))
+        self.assertIs(module.ISchema, module.MODEL.schema)
+        self.assertEqual(serializeModel(model), serializeModel(module.MODEL))
+        self.assertEqual(
+            model.schema.getTaggedValue("invariants"),
+            module.ISchema.getTaggedValue("invariants"),
+        )
+        self.assertEqual("b", module.ISchema["title"].default)
+        # title overrides the field of IBase and keeps its order
+        self.assertEqual(
+            ["title", "description", "name", "x"],
+            getFieldNamesInOrder(model.schema)[:4],
+        )
+        self.assertEqual(
+            getFieldNamesInOrder(model.schema), getFieldNamesInOrder(module.ISchema)
+        )
+        self.assertEqual(
+            "plone.supermodel.tests",
+            module.ISchema["title"].title.domain,
+        )
+        with open(output) as fd:
+            self.assertEqual(generate(model, origin="model.xml"), fd.read())
+
+        # Sources cannot be serialized, but are imported by the name the
+        # model refers to them by
+        bound = source.replace(
+            b"<vocabulary>plone.supermodel.tests.vocabulary</vocabulary>",
+            b"<source>plone.supermodel.tests.dummy_binder</source>",
+        )
+        found = references(BytesIO(bound))
+        self.assertIs(dummy_binder, found["plone.supermodel.tests.dummy_binder"])
+        self.assertIs(IBase, found["plone.supermodel.tests.IBase"])
+        with self.assertRaises(NotImplementedError):
+            generate(parse(BytesIO(bound)))
+        namespace = {}
+        exec(generate(parse(BytesIO(bound)), references=found), namespace)
+        self.assertIs(
+            dummy_binder, namespace["MODEL"].schemata["edit-form"]["named"].vocabulary
+        )
+
+        class Unnamed(schema.TextLine):
+            pass
+
+        model.schema["title"].__class__ = Unnamed
+        with self.assertRaises(ValueError):
+            generate(model)
+
+
+class TestShareFields(ParseTestCase):
+    def test_share_fields(self):
+        self.addCleanup(setattr, parser, "SHARE_FIELDS", parser.SHARE_FIELDS)
+        self.addCleanup(parser.fieldPool.clear)
+        parser.fieldPool.clear()
+
+        field = b"""\
+        <field type="zope.schema.Choice" name="%s">
+            <title>Colour</title>
+            <values><element>red</element><element>green</element></values>
+        </field>
+"""
+        source = b"""\
+<model xmlns="http://namespaces.plone.org/supermodel/schema">
+    <schema>%s%s</schema>
+    <schema name="other">%s</schema>
+</model>
+""" % (
+            field % b"colour",
+            field % b"shade",
+            field % b"colour",
+        )
+        parser.SHARE_FIELDS = False
+        expected = serializeModel(parser.parse(BytesIO(source)))
+        parser.SHARE_FIELDS = True
+        model = parser.parse(BytesIO(source))
+        self.assertEqual(expected, serializeModel(model))
+
+        colour = model.schema["colour"]
+        shade = model.schema["shade"]
+        other = model.schemata["other"]["colour"]
+        self.assertEqual(("colour", "shade"), (colour.__name__, shade.__name__))
+        self.assertIs(model.schema, shade.interface)
+        self.assertIs(model.schemata["other"], other.interface)
+        self.assertLess(colour.order, shade.order)
+        self.assertLess(shade.order, other.order)
+        self.assertIs(colour.vocabulary, other.vocabulary)
+        self.assertIs(colour.title, shade.title)
+
+        colour.setTaggedValue("tag", "value")
+        self.assertIsNone(other.queryTaggedValue("tag"))
+
+        stats = parser.fieldPool.stats()
+        self.assertEqual(1, stats["size"])
+        self.assertEqual(2, stats["hits"])
+        self.assertGreater(stats["saved"], 0)
+
+
 class Py23DocChecker(doctest.OutputChecker):
     def check_output(self, want, got, optionflags):
         want = re.sub("u'(.*?)'", "'\\1'", want)
@@ -600,6 +1731,18 @@ def test_suite():
             unittest.defaultTestLoader.loadTestsFromTestCase(TestUtils),
             unittest.defaultTestLoader.loadTestsFromTestCase(TestValueToElement),
             unittest.defaultTestLoader.loadTestsFromTestCase(TestChoiceHandling),
+            unittest.defaultTestLoader.loadTestsFromTestCase(TestFieldsets),
+            unittest.defaultTestLoader.loadTestsFromTestCase(TestLazySchemata),
+            unittest.defaultTestLoader.loadTestsFromTestCase(TestLoadElement),
+            unittest.defaultTestLoader.loadTestsFromTestCase(TestLoadFile),
+            unittest.defaultTestLoader.loadTestsFromTestCase(TestConcurrentParsing),
+            unittest.defaultTestLoader.loadTestsFromTestCase(TestParseContext),
+            unittest.defaultTestLoader.loadTestsFromTestCase(TestParseSources),
+            unittest.defaultTestLoader.loadTestsFromTestCase(TestValidate),
+            unittest.defaultTestLoader.loadTestsFromTestCase(TestMetadataHandlers),
+            unittest.defaultTestLoader.loadTestsFromTestCase(TestModelBundle),
+            unittest.defaultTestLoader.loadTestsFromTestCase(TestCodegen),
+            unittest.defaultTestLoader.loadTestsFromTestCase(TestShareFields),
             doctest.DocFileSuite(
                 "fields.rst",
                 setUp=zope.component.testing.setUp,
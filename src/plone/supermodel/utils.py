@@ -1,14 +1,17 @@
 from collections import OrderedDict
+from contextlib import contextmanager
 from lxml import etree
-from plone.supermodel.debug import parseinfo
+from plone.supermodel.debug import parseContext
+from plone.supermodel.interfaces import FILENAME_KEY
 from plone.supermodel.interfaces import I18N_NAMESPACE
 from plone.supermodel.interfaces import IToUnicode
 from plone.supermodel.interfaces import XML_NAMESPACE
 from zope.component import getUtility
+from zope.configuration import xmlconfig
+from zope.dottedname.resolve import resolve
 from zope.i18nmessageid import Message
-from zope.interface import directlyProvidedBy
-from zope.interface import directlyProvides
 from zope.interface.interface import Element
+from zope.schema import getFields
 from zope.schema.interfaces import IChoice
 from zope.schema.interfaces import ICollection
 from zope.schema.interfaces import IDict
@@ -17,6 +20,8 @@ from zope.schema.interfaces import IFromUnicode
 from zope.schema.interfaces import ISet
 from zope.schema.interfaces import IVocabularyFactory
 
+import hashlib
+import mmap
 import os.path
 import re
 import sys
@@ -36,6 +41,127 @@ def noNS(name):
     return noNS_re.sub("", name)
 
 
+@contextmanager
+def mappedFile(path):
+    """Yield the contents of the file as a read only buffer, memory mapped
+    where possible so that hashing and parsing it need not copy it.
+    """
+    with open(path, "rb") as fd:
+        try:
+            buffer = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Empty files and files that cannot be mapped
+            buffer = None
+        if buffer is None:
+            yield fd.read()
+            return
+        with buffer:
+            yield buffer
+
+
+def contentHash(buffer):
+    """Return a hex digest identifying the contents of the buffer."""
+    return hashlib.sha256(buffer).hexdigest()
+
+
+# If true, strings and i18n messages read from models are shared through
+# stringPool, so that titles, msgids and tokens repeated across models are
+# kept in memory once.
+INTERN_STRINGS = bool(os.environ.get("PLONE_SUPERMODEL_INTERN_STRINGS"))
+
+
+class StringPool:
+    """A bounded pool of strings and i18n messages read from models.
+
+    Messages are immutable, so equal ones can be shared. Once the pool holds
+    maxsize entries, no more are added. ``hits`` counts the values that were
+    found in the pool and ``saved`` estimates the bytes of the duplicates
+    that were dropped or not created for them. Both may be approximate when
+    models are parsed in several threads.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.clear()
+
+    def __len__(self):
+        return len(self._values)
+
+    def clear(self):
+        self._values = {}
+        self.hits = 0
+        self.saved = 0
+
+    def string(self, value):
+        """Return the pooled string equal to value. Anything but a str is
+        returned as it is.
+        """
+        if type(value) is not str:
+            return value
+        pooled = self._values.get(value)
+        if pooled is not None:
+            self.hits += 1
+            self.saved += sys.getsizeof(value)
+            return pooled
+        if len(self._values) < self.maxsize:
+            value = self._values.setdefault(value, value)
+        return value
+
+    def message(self, msgid, domain=None, default=None):
+        """Return the pooled Message with the given msgid, domain and
+        default, creating it if needed.
+        """
+        key = (msgid, domain, default)
+        pooled = self._values.get(key)
+        if pooled is not None:
+            self.hits += 1
+            self.saved += sys.getsizeof(pooled)
+            return pooled
+        message = Message(
+            self.string(msgid), domain=self.string(domain), default=self.string(default)
+        )
+        if len(self._values) < self.maxsize:
+            message = self._values.setdefault(key, message)
+        return message
+
+    def stats(self):
+        """Return the number of pooled values, hits and saved bytes."""
+        return {"size": len(self._values), "hits": self.hits, "saved": self.saved}
+
+
+stringPool = StringPool(
+    int(os.environ.get("PLONE_SUPERMODEL_INTERN_MAXSIZE") or 100000)
+)
+
+
+def internString(value):
+    """Return the pooled copy of the string if INTERN_STRINGS is set."""
+    if INTERN_STRINGS:
+        return stringPool.string(value)
+    return value
+
+
+def _message(msgid, domain=None, default=None):
+    if INTERN_STRINGS:
+        return stringPool.message(msgid, domain, default)
+    return Message(msgid, domain=domain, default=default)
+
+
+def elementNamespaces(element):
+    """Return the set of XML namespaces used in the tags and attribute names
+    of the element and its descendants.
+    """
+    namespaces = set()
+    for node in element.iter(etree.Element):
+        tag = node.tag
+        if tag[0] == "{":
+            namespaces.add(tag[1 : tag.index("}")])
+        for name in node.attrib:
+            if name[0] == "{":
+                namespaces.add(name[1 : name.index("}")])
+    return namespaces
+
+
 def indent(node, level=0):
     INDENT_SIZE = 2
     node_indent = level * (" " * INDENT_SIZE)
@@ -68,8 +194,9 @@ def prettyXML(tree):
     return xml.decode()
 
 
-def fieldTypecast(field, value):
-    typecast = getattr(field, "_type", None)
+def fieldTypecast(field, value, typecast=None):
+    if typecast is None:
+        typecast = getattr(field, "_type", None)
     if typecast is not None:
         if not isinstance(typecast, (list, tuple)):
             typecast = (typecast,)
@@ -83,42 +210,42 @@ def fieldTypecast(field, value):
     return value
 
 
-def elementToValue(field, element, default=_marker):
+def elementToValue(field, element, default=_marker, context=None):
     """Read the contents of an element that is assumed to represent a value
     allowable by the given field.
 
     If converter is given, it should be an IToUnicode instance.
 
     If not, the field will be adapted to this interface to obtain a converter.
+
+    context is the ParseContext to use, by default the current one.
     """
+    if context is None:
+        context = parseContext()
     value = default
     if IDict.providedBy(field):
         key_converter = IFromUnicode(field.key_type)
         value = OrderedDict()
-        for child in element.iterchildren(tag=etree.Element):
+        for child in context.track(element.iterchildren(tag=etree.Element)):
             if noNS(child.tag.lower()) != "element":
                 continue
-            parseinfo.stack.append(child)
 
             key_text = child.attrib.get("key")
             if key_text is None:
                 k = None
             else:
-                k = key_converter.fromUnicode(str(key_text))
+                k = internString(key_converter.fromUnicode(str(key_text)))
 
-            value[k] = elementToValue(field.value_type, child)
-            parseinfo.stack.pop()
+            value[k] = elementToValue(field.value_type, child, context=context)
         value = fieldTypecast(field, value)
 
     elif ICollection.providedBy(field):
         value = []
-        for child in element.iterchildren(tag=etree.Element):
+        for child in context.track(element.iterchildren(tag=etree.Element)):
             if noNS(child.tag.lower()) != "element":
                 continue
-            parseinfo.stack.append(child)
-            v = elementToValue(field.value_type, child)
+            v = elementToValue(field.value_type, child, context=context)
             value.append(v)
-            parseinfo.stack.pop()
         value = fieldTypecast(field, value)
 
     elif IChoice.providedBy(field):
@@ -129,13 +256,20 @@ def elementToValue(field, element, default=_marker):
         except Exception:
             pass
 
+        typecast = None
         if vocabulary and hasattr(vocabulary, "by_value"):
             try:
-                field._type = type(list(vocabulary.by_value.keys())[0])
+                typecast = type(next(iter(vocabulary.by_value)))
             except Exception:
                 pass
 
-        value = fieldTypecast(field, element.text)
+        if typecast is None:
+            value = fieldTypecast(field, element.text)
+        else:
+            # Keep the type for later conversions of this field, but do not
+            # read it back: the field may be shared with other threads.
+            field._type = typecast
+            value = fieldTypecast(field, element.text, typecast)
 
     # Unicode
     else:
@@ -148,18 +282,18 @@ def elementToValue(field, element, default=_marker):
                 text = text.decode()
             else:
                 text = str(text)
-            value = converter.fromUnicode(text)
+            value = internString(converter.fromUnicode(text))
 
         # handle i18n
-        if isinstance(value, str) and parseinfo.i18n_domain is not None:
+        if isinstance(value, str) and context.i18n_domain is not None:
             translate_attr = ns("translate", I18N_NAMESPACE)
             domain_attr = ns("domain", I18N_NAMESPACE)
             msgid = element.attrib.get(translate_attr)
-            domain = element.attrib.get(domain_attr, parseinfo.i18n_domain)
+            domain = element.attrib.get(domain_attr, context.i18n_domain)
             if msgid:
-                value = Message(msgid, domain=domain, default=value)
+                value = _message(msgid, domain=domain, default=value)
             elif translate_attr in element.attrib:
-                value = Message(value, domain=domain)
+                value = _message(value, domain=domain)
 
     return value
 
@@ -212,6 +346,21 @@ def valueToElement(field, value, name=None, force=False):
     return child
 
 
+def configure(packages=()):
+    """Load the component registrations of plone.supermodel and of the
+    given packages, for command line tools that parse models.
+    """
+    includes = "".join(
+        f'<include package="{package}" />'
+        for package in ["plone.supermodel"] + list(packages)
+    )
+    xmlconfig.string(
+        '<configure xmlns="http://namespaces.zope.org/zope">'
+        '<include package="zope.component" file="meta.zcml" />'
+        f"{includes}</configure>"
+    )
+
+
 def relativeToCallingPackage(filename, callingFrame=2):
     """If the filename is not an absolute path, make it into an absolute path
     by calculating the relative path from the module that called the function
@@ -233,6 +382,37 @@ def relativeToCallingPackage(filename, callingFrame=2):
         return os.path.abspath(os.path.join(directory, filename))
 
 
+def modelFilename(interface):
+    """Return the absolute path of the model file named in the FILENAME_KEY
+    tagged value of the given interface, as set by the load directive, or
+    None. A relative filename is relative to the package of the module the
+    interface is defined in.
+    """
+    filename = Element.queryTaggedValue(interface, FILENAME_KEY, default=None)
+    if filename is None:
+        return None
+
+    moduleName = interface.__module__
+    module = sys.modules.get(moduleName, None)
+
+    directory = moduleName
+
+    if hasattr(module, "__path__"):
+        directory = module.__path__[0]
+    else:
+        while "." in moduleName:
+            moduleName, _ = moduleName.rsplit(".", 1)
+            module = sys.modules.get(moduleName, None)
+            if hasattr(module, "__path__"):
+                directory = module.__path__[0]
+                break
+
+    directory = os.path.abspath(directory)
+    # Let / act as path separator on all platforms
+    filename = filename.replace("/", os.path.sep)
+    return os.path.abspath(os.path.join(directory, filename))
+
+
 def sortedFields(schema):
     """Like getFieldsInOrder, but does not include fields from bases"""
     fields = []
@@ -249,6 +429,64 @@ def sortedFields(schema):
     return fields
 
 
+# Caches for resolveDottedName() and getBaseFields()
+_resolved = {}
+_base_fields = {}
+
+
+def resolveDottedName(dotted):
+    """Like zope.dottedname.resolve.resolve(), but remember the result.
+
+    A remembered object is only used while the module it was found in is
+    still in sys.modules and still has it under the same name, so reloading
+    a module or replacing it in sys.modules invalidates the entry.
+    """
+    entry = _resolved.get(dotted)
+    if entry is not None:
+        obj, modname, module, attrs = entry
+        if sys.modules.get(modname) is module:
+            current = module
+            for attr in attrs:
+                current = getattr(current, attr, _marker)
+            if current is obj:
+                return obj
+
+    obj = resolve(dotted)
+    parts = dotted.split(".")
+    for i in range(len(parts), 0, -1):
+        modname = ".".join(parts[:i])
+        module = sys.modules.get(modname)
+        if module is not None:
+            _resolved[dotted] = (obj, modname, module, tuple(parts[i:]))
+            break
+    return obj
+
+
+def getBaseFields(bases):
+    """Return a new dict of the fields of all the given schemata, with fields
+    from later ones overriding those of earlier ones.
+
+    The fields of each schema are remembered until its bases change or
+    syncSchema() changes the fields of it or of a schema it extends. A
+    reloaded module has new schemata, which are looked up afresh.
+    """
+    fields = {}
+    for base in bases:
+        entry = _base_fields.get(id(base))
+        if entry is None or entry[0] is not base or entry[1] is not base.__iro__:
+            entry = _base_fields[id(base)] = (base, base.__iro__, getFields(base))
+        fields.update(entry[2])
+    return fields
+
+
+def _ensureFinalized(iface):
+    # Run the schema plugins of a schema whose finalization was deferred, see
+    # plone.supermodel.model.DEFERRED_FINALIZE
+    ensureFinalized = getattr(iface, "_SchemaClass_ensureFinalized", None)
+    if ensureFinalized is not None:
+        ensureFinalized()
+
+
 def mergedTaggedValueDict(schema, name):
     """Look up the tagged value 'name' in schema and all its bases, assuming
     that the value under 'name' is a dict. Return a dict that consists of
@@ -257,6 +495,7 @@ def mergedTaggedValueDict(schema, name):
     """
     tv = {}
     for iface in reversed(schema.__iro__):
+        _ensureFinalized(iface)
         tv.update(Element.queryTaggedValue(iface, name, default={}))
     return tv
 
@@ -269,10 +508,27 @@ def mergedTaggedValueList(schema, name):
     """
     tv = []
     for iface in reversed(schema.__iro__):
+        _ensureFinalized(iface)
         tv.extend(Element.queryTaggedValue(iface, name, default=[]))
     return tv
 
 
+def cloneField(field):
+    """Return a shallow copy of the field.
+
+    The copy shares the values of the field's attributes, including the
+    declaration of its marker interfaces, which is only replaced when
+    interfaces are provided to the copy. Only the tagged values, which
+    setTaggedValue() changes in place, are copied.
+    """
+    clone = field.__class__.__new__(field.__class__)
+    clone.__dict__.update(field.__dict__)
+    tagged_values = clone.__dict__.get("_Element__tagged_values")
+    if tagged_values is not None:
+        clone._Element__tagged_values = dict(tagged_values)
+    return clone
+
+
 def syncSchema(source, dest, overwrite=False, sync_bases=False):
     """Copy attributes and tagged values from the source to the destination.
     If overwrite is False, do not overwrite attributes or tagged values that
@@ -297,14 +553,10 @@ def syncSchema(source, dest, overwrite=False, sync_bases=False):
 
     for name, field in sortedFields(source):
         if overwrite or name not in dest or dest[name].interface is not dest:
-            clone = field.__class__.__new__(field.__class__)
-            clone.__dict__.update(field.__dict__)
+            clone = cloneField(field)
             clone.interface = dest
             clone.__name__ = name
 
-            # copy any marker interfaces
-            directlyProvides(clone, *directlyProvidedBy(field))
-
             # setattr(dest, name, clone)
             dest._InterfaceClass__attrs[name] = clone
             if hasattr(dest, "_v_attrs"):
@@ -312,6 +564,11 @@ def syncSchema(source, dest, overwrite=False, sync_bases=False):
                     dest._v_attrs = {}
                 dest._v_attrs[name] = clone
 
+    # The fields of dest, and so of the schemata extending it, may have changed
+    for key, entry in list(_base_fields.items()):
+        if entry[0].isOrExtends(dest):
+            _base_fields.pop(key, None)
+
     # Copy tagged values
     dest_tags = set(dest.getTaggedValueTags())
     for tag in source.getTaggedValueTags():